@@ -1,13 +1,105 @@
 from django.contrib import admin
-from .models import Student, StudentDue
+from django.db import transaction
+from django.urls import reverse
+from django.utils.html import format_html
+from .ledger import ledger_totals, refresh_ledgers
+from .models import ReminderOutbox, Student, StudentDue, Tombstone
+from .queries import EstimatedCountPaginator
+from .search import search_students
+from .sync import record_deletions
+# Built for 100k+ dues: no per-row relation queries (list_select_related /
+# annotated ledger totals), no COUNT(*) on every page (estimated counts,
+# show_full_result_count off), date range filters on indexed date columns
+# (date_hierarchy's year list is a DISTINCT over every row) and autocomplete
+# instead of a <select> of every student.
 class StudentDueInline(admin.TabularInline):
+    # at most MAX_DUES rows, unpaid dues first; the full schedule is on the
+    # StudentDue changelist, linked from the student page
+    MAX_DUES = 24
     model = StudentDue
     extra = 0
+    max_num = MAX_DUES
+    fields = ('due_date', 'amount', 'paid', 'collected_by', 'payment_method')
+    ordering = ('due_date',)
+    classes = ('collapse',)
+    def get_queryset(self, request):
+        # each inline row prints StudentDue.__str__, which reads the student
+        qs = super().get_queryset(request).select_related('student')
+        object_id = request.resolver_match.kwargs.get('object_id') if request.resolver_match else None
+        if object_id:
+            shown = (StudentDue.objects.filter(student_id=object_id)
+                     .order_by('paid', 'due_date', 'id')
+                     .values_list('id', flat=True)[:self.MAX_DUES])
+            qs = qs.filter(id__in=list(shown))
+        return qs
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ('name','mobile','course','joining_date','total_due_months','registration_fee','registration_fee_paid')
+    list_display = ('name','mobile','course','joining_date','total_due_months','registration_fee','registration_fee_paid','paid_amount','outstanding_amount')
+    list_filter = ('registration_fee_paid', 'total_due_months', ('joining_date', admin.DateFieldListFilter))
+    search_fields = ('name', 'mobile')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [StudentDueInline]
+    readonly_fields = ('all_dues',)
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(**ledger_totals())
+    def get_search_results(self, request, queryset, search_term):
+        # the indexed fees.search lookup (also behind StudentDue's student
+        # autocomplete) instead of icontains scans over search_fields
+        return search_students(queryset, search_term), False
+    @admin.display(description='Dues')
+    def all_dues(self, obj):
+        if not obj.pk:
+            return '-'
+        url = reverse('admin:fees_studentdue_changelist') + f'?student__id__exact={obj.pk}'
+        return format_html('<a href="{}">All {} dues</a>', url, obj.total_due_months)
+    @admin.display(description='Paid', ordering='total_paid')
+    def paid_amount(self, obj):
+        return obj.total_paid
+    @admin.display(description='Outstanding', ordering='total_due')
+    def outstanding_amount(self, obj):
+        return obj.total_due
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_ledgers([form.instance.pk])
+    def save_formset(self, request, form, formset, change):
+        deleted = [f.instance.pk for f in formset.deleted_forms if f.instance.pk]
+        super().save_formset(request, form, formset, change)
+        if deleted and formset.model is StudentDue:
+            record_deletions(Tombstone.DUE, [(pk, form.instance.pk) for pk in deleted])
 @admin.register(StudentDue)
 class StudentDueAdmin(admin.ModelAdmin):
-    list_display = ('student','due_date','amount','paid')
-    list_filter = ('paid',)
+    list_display = ('student','due_date','amount','paid','collected_by','payment_method')
+    list_filter = ('paid', ('due_date', admin.DateFieldListFilter), 'collected_by', 'payment_method')
+    list_select_related = ('student',)
+    ordering = ('-due_date', '-id')
+    autocomplete_fields = ('student',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # keep StudentLedger in step with edits made here
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            old_student_id = StudentDue.objects.filter(pk=obj.pk).values_list('student_id', flat=True).first()
+            super().save_model(request, obj, form, change)
+            refresh_ledgers({obj.student_id, old_student_id} - {None})
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            pk = obj.pk
+            super().delete_model(request, obj)
+            refresh_ledgers([obj.student_id])
+            record_deletions(Tombstone.DUE, [(pk, obj.student_id)])
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rows = list(queryset.values_list('id', 'student_id'))
+            super().delete_queryset(request, queryset)
+            refresh_ledgers({student_id for _, student_id in rows})
+            record_deletions(Tombstone.DUE, rows)
+@admin.register(ReminderOutbox)
+class ReminderOutboxAdmin(admin.ModelAdmin):
+    list_display = ('student','due','mobile','status','rendered_at','opened_at')
+    list_filter = ('status',)
+    list_select_related = ('student','due__student')
+    search_fields = ('student__name','mobile')
+    raw_id_fields = ('student','due')
+    ordering = ('-id',)
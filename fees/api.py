@@ -0,0 +1,184 @@
+"""Read-only JSON API for clients that don't need the HTML list.
+
+GET /api/students/ returns students with their ledger figures, filtered like
+student_list (join_from, join_to, q) and paged with an opaque keyset cursor
+instead of LIMIT/OFFSET, so page 500 costs the same as page 1:
+
+  ?order=months    (total_due_months, -id), the student_list grouping, on
+                   fees_student_group_idx (the default)
+  ?order=next_due  (next_due_date, id) on fees_ledger_next_due_idx; only
+                   students with an unpaid due, soonest first
+  ?limit=N         page size, default 50, at most 200
+  ?fields=a,b      only these fields (id is always included)
+  ?include=dues    add each student's dues, in one extra query
+  ?cursor=...      the ``next`` value of the previous page
+
+GET /api/changes/?since=<watermark> is the delta-sync feed (fees.sync).
+"""
+import base64
+import json
+from datetime import date
+
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .ledger import ledger_totals
+from .models import Student, StudentDue
+from .queries import check_filter_dates, filter_students, overdue_count
+from .sync import StaleWatermark, WatermarkError, changes
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+STUDENT_FIELDS = (
+    'id', 'name', 'mobile', 'course', 'registration_date', 'joining_date',
+    'registration_fee', 'registration_fee_paid', 'total_due_months', 'last_updated',
+)
+LEDGER_FIELDS = (
+    'completed', 'total_paid', 'total_due',
+    'next_due_date', 'next_due_amount', 'overdue_count',
+)
+FIELDS = STUDENT_FIELDS + LEDGER_FIELDS
+DUE_FIELDS = ('id', 'due_date', 'amount', 'paid', 'collected_by', 'payment_method')
+
+# order name -> (sort key field, ids ascending?), matching the index
+ORDERINGS = {
+    'months': ('total_due_months', False),
+    'next_due': ('next_due_date', True),
+}
+
+
+class ApiError(ValueError):
+    pass
+
+
+def encode_cursor(order, key, pk):
+    raw = json.dumps([order, key.isoformat() if isinstance(key, date) else key, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_order, key, pk = json.loads(raw)
+        if cursor_order != order:
+            raise ApiError("Cursor belongs to a different order")
+        if order == 'next_due':
+            return date.fromisoformat(key), int(pk)
+        return int(key), int(pk)
+    except ApiError:
+        raise
+    except (ValueError, TypeError):
+        raise ApiError("Invalid cursor")
+
+
+def api_queryset(params, order):
+    today = date.today()
+    qs = filter_students(Student.objects.all(), params, today).annotate(
+        **ledger_totals(),
+        next_due_date=F('ledger__next_due_date'),
+        next_due_amount=F('ledger__next_due_amount'),
+        # counted against today: the ledger's copy is as of its last refresh
+        overdue_count=overdue_count(today),
+    )
+    if order == 'next_due':
+        return (
+            qs.filter(ledger__next_due_date__isnull=False)
+            .order_by('ledger__next_due_date', 'ledger__student_id')
+        )
+    return qs.order_by('total_due_months', '-id')
+
+
+def keyset_page(qs, order, after, limit):
+    """The ``limit`` rows of ``qs`` after the (key, id) position ``after``.
+
+    The key range comes first so the index seek bounds the scan; the OR
+    only breaks ties inside the cursor's key.
+    """
+    if after is not None:
+        key_field, ids_ascending = ORDERINGS[order]
+        lookup = f'ledger__{key_field}' if order == 'next_due' else key_field
+        key, pk = after
+        id_after = Q(id__gt=pk) if ids_ascending else Q(id__lt=pk)
+        qs = qs.filter(**{f'{lookup}__gte': key}).filter(Q(**{f'{lookup}__gt': key}) | id_after)
+    return qs[:limit]
+
+
+def _parse(params):
+    order = params.get('order') or 'months'
+    if order not in ORDERINGS:
+        raise ApiError(f"Unknown order: {order}")
+    try:
+        limit = min(MAX_LIMIT, max(1, int(params.get('limit') or DEFAULT_LIMIT)))
+    except ValueError:
+        raise ApiError("limit must be a number")
+    fields = [f for f in (params.get('fields') or '').split(',') if f.strip()]
+    fields = [f.strip() for f in fields] or list(FIELDS)
+    unknown = sorted(set(fields) - set(FIELDS))
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    try:
+        check_filter_dates(params)
+    except ValueError as e:
+        raise ApiError(str(e))
+    after = decode_cursor(params['cursor'], order) if params.get('cursor') else None
+    include = set((params.get('include') or '').split(','))
+    return order, limit, fields, after, 'dues' in include
+
+
+def _dues_by_student(student_ids):
+    dues = {pk: [] for pk in student_ids}
+    rows = (
+        StudentDue.objects
+        .filter(student_id__in=student_ids)
+        .order_by('student_id', 'due_date')
+        .values('student_id', *DUE_FIELDS)
+    )
+    for row in rows:
+        dues[row.pop('student_id')].append(row)
+    return dues
+
+
+@require_GET
+def students_api(request):
+    try:
+        order, limit, fields, after, with_dues = _parse(request.GET)
+    except ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    key_field, _ = ORDERINGS[order]
+    columns = list(dict.fromkeys(fields + [key_field]))
+    # one row more than the page tells whether there is a next page
+    rows = list(keyset_page(api_queryset(request.GET, order), order, after, limit + 1).values(*columns))
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(order, last[key_field], last['id'])
+    if key_field not in fields:
+        for row in rows:
+            del row[key_field]
+    if with_dues:
+        dues = _dues_by_student([row['id'] for row in rows])
+        for row in rows:
+            row['dues'] = dues[row['id']]
+    return JsonResponse({'results': rows, 'next': next_cursor, 'limit': limit})
+
+
+@require_GET
+def changes_api(request):
+    """Students, dues and tombstones changed since ``since``; keep calling
+    with the returned ``watermark`` while ``more`` is true. 410 (``resync``)
+    means deletes past ``since`` were pruned: start again without it."""
+    try:
+        limit = min(MAX_LIMIT * 10, max(1, int(request.GET.get('limit') or 500)))
+        return JsonResponse(changes(request.GET.get('since'), limit))
+    except StaleWatermark as e:
+        return JsonResponse({'error': str(e), 'resync': True}, status=410)
+    except (ValueError, WatermarkError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
@@ -0,0 +1,117 @@
+"""Moving finished students out of Student / StudentDue.
+
+A student can be archived once the registration fee and every due are
+paid and the course is over: joined and last due before the cutoff.
+Students without any dues are left alone; their schedule has not been
+generated yet, which is not the same as finished. archive() copies such
+students and their dues to ArchivedStudent / ArchivedDue under their
+original ids and deletes them from the hot tables, one committed chunk at
+a time. An interrupted run just continues with the students still left.
+
+The Student delete takes the usual path: the post_delete handler drops
+the search index row and writes the tombstone that tells sync clients to
+forget the student. The collections rollup keeps counting archived dues
+(fees.rollup). restore_student() inserts the student and dues again
+under the same ids and stamps them as changed, so they come back through
+the changes feed, and drops the student's tombstone.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .audit import audit
+from .ledger import refresh_ledgers
+from .models import ArchivedDue, ArchivedStudent, Student, StudentDue, Tombstone
+
+STUDENT_FIELDS = [f.attname for f in Student._meta.concrete_fields]
+DUE_FIELDS = [f.attname for f in StudentDue._meta.concrete_fields]
+
+
+def archive_cutoff(today=None, days=None):
+    if days is None:
+        days = getattr(settings, 'FEES_ARCHIVE_AFTER_DAYS', 180)
+    return (today or date.today()) - timedelta(days=days)
+
+
+def archive_candidates(cutoff):
+    """Fully paid students whose course ended before ``cutoff``, by id."""
+    return (
+        Student.objects
+        .filter(
+            registration_fee_paid=True,
+            joining_date__lt=cutoff,
+            ledger__isnull=False,
+            ledger__due_count__gt=0,
+            ledger__next_due__isnull=True,
+        )
+        .exclude(Exists(StudentDue.objects.filter(student=OuterRef('pk'), due_date__gte=cutoff)))
+        # the ledger picks the candidates; the dues table has the last word
+        # before their rows are deleted
+        .exclude(Exists(StudentDue.objects.filter(student=OuterRef('pk'), paid=False)))
+        .order_by('id')
+    )
+
+
+def archive_students(student_ids, actor=''):
+    """Move ``student_ids`` and their dues to the archive tables; returns
+    the ids archived."""
+    now = timezone.now()
+    with transaction.atomic():
+        students = list(Student.objects.filter(id__in=student_ids).values(*STUDENT_FIELDS))
+        if not students:
+            return []
+        ids = [s['id'] for s in students]
+        ArchivedStudent.objects.bulk_create(
+            [ArchivedStudent(archived_at=now, **s) for s in students]
+        )
+        ArchivedDue.objects.bulk_create(
+            [ArchivedDue(**d) for d in StudentDue.objects.filter(student_id__in=ids).values(*DUE_FIELDS)],
+            batch_size=1000,
+        )
+        Student.objects.filter(id__in=ids).delete()
+        audit('archive_students', entity_type='student', actor=actor, student_ids=ids)
+    return ids
+
+
+def archive(cutoff, chunk_size=500, actor='', on_chunk=None):
+    """Archive every candidate, ``chunk_size`` students per transaction.
+    Returns the number of students archived."""
+    archived, after = 0, 0
+    while True:
+        ids = list(
+            archive_candidates(cutoff).filter(id__gt=after).values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return archived
+        after = ids[-1]
+        archived += len(archive_students(ids, actor))
+        if on_chunk:
+            on_chunk(archived)
+
+
+def restore_student(archived_id, actor=''):
+    """Put an archived student and its dues back under their original ids;
+    returns the Student."""
+    with transaction.atomic():
+        archived = ArchivedStudent.objects.select_for_update().get(pk=archived_id)
+        student = Student(**{f: getattr(archived, f) for f in STUDENT_FIELDS})
+        # a plain save: the post_save handler re-indexes the student for search
+        student.save(force_insert=True)
+        dues = StudentDue.objects.bulk_create(
+            [StudentDue(**{f: getattr(d, f) for f in DUE_FIELDS}) for d in archived.dues.all()],
+            batch_size=1000,
+        )
+        # the archive's tombstone would reach a client in the same poll as
+        # the restored rows and, the streams being unordered, could win;
+        # the rollup loses nothing, it only drops entries of missing dues
+        Tombstone.objects.filter(
+            Q(kind=Tombstone.STUDENT, object_id=student.id)
+            | Q(kind=Tombstone.DUE, object_id__in=[d.id for d in dues])
+        ).delete()
+        refresh_ledgers([student.id])
+        archived.delete()
+        audit('restore_student', student, actor=actor)
+    return student
@@ -0,0 +1,185 @@
+"""Async versions of the list page and its partial-refresh endpoints.
+
+Served instead of the views in fees.views when settings.FEES_ASYNC_VIEWS is
+on and the project runs under an ASGI server (see student_fees/asgi.py).
+Reads use the async ORM and the async cache API, so a slow listing waits on
+the event loop instead of holding a worker; the write paths (toggle_paid,
+mark_paid) need transactions, which the async ORM does not support, and
+run in a thread through sync_to_async.
+"""
+from datetime import date
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+
+from .audit import aactor_for, audit
+from .caching import alist_condition, cache_list_page, list_params
+from .db import retry_on_db_lock
+from .fragments import arender_rows
+from .models import Student, StudentDue, StudentLedger
+from .payments import dues_for_rule, mark_paid, toggle_paid
+from .queries import CountedPaginator, agroup_counts, astudent_queryset
+from .views import _student_row, reminder_link, wants_partial
+
+
+def _back_to_list(params):
+    next_qs = (params.get('next') or '').strip()
+    if next_qs:
+        return redirect(f"{reverse('fees:student_list')}?{next_qs}")
+    return redirect('fees:student_list')
+
+
+@ensure_csrf_cookie
+@alist_condition
+@cache_list_page
+async def student_list(request):
+    qs = await astudent_queryset(request.GET)
+    today = date.today()
+
+    try:
+        group_page_size = int(request.GET.get('group_page_size') or 10)
+    except Exception:
+        group_page_size = 10
+
+    counts = await agroup_counts(request.GET)
+    grouped_pages = []
+    for months, n in sorted(counts.items()):
+        group_paginator = CountedPaginator(
+            qs.filter(total_due_months=months), group_page_size, n
+        )
+        # the count is known, so get_page only slices the queryset lazily
+        group_page_obj = group_paginator.get_page(request.GET.get(f'gp_{months}'))
+        group_page_obj.object_list = [s async for s in group_page_obj.object_list]
+        grouped_pages.append({
+            'months': months,
+            'label': f"{months} Month(s)",
+            'page_obj': group_page_obj,
+            'paginator': group_paginator,
+        })
+
+    page_students = [s for gp in grouped_pages for s in gp['page_obj'].object_list]
+    rows = await arender_rows(page_students, _student_row, today)
+    for gp in grouped_pages:
+        gp['page_obj'].object_list = [
+            {'student': s, 'row_html': rows[s.id]} for s in gp['page_obj'].object_list
+        ]
+
+    ctx = {
+        'grouped_pages': grouped_pages,
+        'join_from': (request.GET.get('join_from') or '').strip(),
+        'join_to': (request.GET.get('join_to') or '').strip(),
+        'q': (request.GET.get('q') or '').strip(),
+        'status': (request.GET.get('status') or '').strip(),
+        'sort': (request.GET.get('sort') or '').strip(),
+        'today': today,
+        'total_students': sum(counts.values()),
+        'group_page_size': group_page_size,
+        # only the params that are part of the page's cache key
+        'list_query': urlencode(list_params(request.GET)),
+        'csrf_cookie_name': settings.CSRF_COOKIE_NAME,
+    }
+    return render(request, 'fees/student_list.html', ctx)
+
+
+async def _student_totals(request, student, ledger=None):
+    ledger = ledger or await StudentLedger.objects.filter(student=student).afirst()
+    dues = [d async for d in student.dues.order_by('due_date')]
+    ctx = {
+        'student': student,
+        'total_paid': ledger.paid_amount if ledger else 0,
+        'total_due': ledger.outstanding_amount if ledger else 0,
+        'whatsapp_link': reminder_link(ledger.next_due_id if ledger else None),
+    }
+    return {
+        'student_id': student.id,
+        'completed': ledger.paid_count if ledger else 0,
+        'total_paid': f"{ctx['total_paid']:.2f}",
+        'total_due': f"{ctx['total_due']:.2f}",
+        'html': render_to_string('fees/_student_totals.html', ctx, request),
+    }, dues
+
+
+def _toggle_reg_fee(student, actor):
+    # one transaction, as in views.toggle_reg_fee: audit() batches on commit
+    with transaction.atomic():
+        student.registration_fee_paid = not student.registration_fee_paid
+        student.save()
+        audit('toggle_reg_fee', student, actor=actor, paid=student.registration_fee_paid)
+
+
+@retry_on_db_lock
+async def toggle_reg_fee(request, pk):
+    s = await aget_object_or_404(Student, pk=pk)
+    await sync_to_async(_toggle_reg_fee)(s, await aactor_for(request))
+    if wants_partial(request):
+        return JsonResponse({
+            'student_id': s.id,
+            'registration_fee_paid': s.registration_fee_paid,
+            'html': render_to_string('fees/_reg_fee_button.html', {'student': s}, request),
+        })
+    return _back_to_list(request.GET)
+
+
+@retry_on_db_lock
+async def toggle_due(request, due_id):
+    d = await aget_object_or_404(StudentDue.objects.select_related('student'), pk=due_id)
+    ledger = None
+    if request.method == "POST":
+        ledger = await sync_to_async(toggle_paid)(
+            d, request.POST.get("collected_by"), request.POST.get("payment_method"),
+            actor=await aactor_for(request),
+        )
+    if wants_partial(request):
+        totals, dues = await _student_totals(request, d.student, ledger)
+        card = render_to_string('fees/_due_card.html', {
+            'd': d,
+            'student': d.student,
+            'month_number': [x.id for x in dues].index(d.id) + 1,
+            'today': date.today(),
+        }, request)
+        return JsonResponse({'due_id': d.id, 'paid': d.paid, 'html': card, 'totals': totals})
+    return _back_to_list(request.POST)
+
+
+@require_POST
+@retry_on_db_lock
+async def mark_dues_paid(request):
+    collected_by = (request.POST.get('collected_by') or '').strip()
+    payment_method = (request.POST.get('payment_method') or '').strip()
+    if not collected_by or not payment_method:
+        return HttpResponseBadRequest('collected_by and payment_method are required')
+    try:
+        due_ids = [int(x) for x in request.POST.getlist('due_ids')]
+        student_ids = [int(x) for x in request.POST.getlist('student_ids')]
+        if due_ids:
+            dues = StudentDue.objects.filter(id__in=due_ids)
+        else:
+            dues = dues_for_rule(student_ids, request.POST.get('rule') or 'overdue')
+    except ValueError as e:
+        return HttpResponseBadRequest(f'Invalid selection: {e}')
+
+    due_ids, ledgers = await sync_to_async(mark_paid)(
+        dues, collected_by, payment_method, await aactor_for(request)
+    )
+    if wants_partial(request):
+        return JsonResponse({
+            'due_ids': due_ids,
+            'students': [
+                {
+                    'student_id': l.student_id,
+                    'completed': l.paid_count,
+                    'total_paid': f"{l.paid_amount:.2f}",
+                    'total_due': f"{l.outstanding_amount:.2f}",
+                }
+                for l in ledgers
+            ],
+        })
+    return _back_to_list(request.POST)
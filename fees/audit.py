@@ -0,0 +1,105 @@
+"""Structured audit entries (ActionLog), written after commit in batches.
+
+audit() never writes inside the caller's transaction. Entries logged
+during a transaction are collected on the connection and saved with one
+bulk_create from a single transaction.on_commit callback; when the
+transaction rolls back the callback is dropped and so are its entries. Outside
+a transaction the entry is written straight away.
+
+Old rows keep their free-text ``payload``; new ones carry the action, the
+entity (type and id), the actor and a JSON ``data`` dict.
+
+prune_log() (``manage.py prune_action_log``) deletes, and optionally
+archives, entries past the retention period in chunks.
+"""
+import json
+import logging
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+
+from .models import ActionLog
+
+logger = logging.getLogger('fees.audit')
+
+
+class _Batch:
+    def __init__(self, using):
+        self.using = using
+        self.entries = []
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        try:
+            ActionLog.objects.using(self.using).bulk_create(entries)
+        except DatabaseError:
+            # the write itself has committed; losing its audit entries must
+            # not turn it into an error page
+            logger.exception("Could not write %d audit entries", len(entries))
+
+
+def _pending_batch(conn):
+    batch = getattr(conn, '_fees_audit_batch', None)
+    # a rolled-back transaction discards its on_commit callbacks; start a
+    # fresh batch rather than appending to one that will never be flushed
+    if batch is None or not any(func == batch.flush for _, func, _ in conn.run_on_commit):
+        batch = conn._fees_audit_batch = _Batch(conn.alias)
+        transaction.on_commit(batch.flush, using=conn.alias)
+    return batch
+
+
+def actor_for(request):
+    user = getattr(request, 'user', None)
+    return user.get_username() if user is not None and user.is_authenticated else ''
+
+
+async def aactor_for(request):
+    user = await request.auser() if hasattr(request, 'auser') else None
+    return user.get_username() if user is not None and user.is_authenticated else ''
+
+
+def audit(action, entity=None, entity_type='', entity_id=None, actor='', using=None, **data):
+    """Record ``action`` on ``entity`` (a model instance) or on
+    ``entity_type`` / ``entity_id``, with ``data`` as its JSON details."""
+    if entity is not None:
+        entity_type = entity_type or entity._meta.model_name
+        entity_id = entity.pk
+    entry = ActionLog(
+        action=action, entity_type=entity_type, entity_id=entity_id,
+        actor=actor or '', data=data or None,
+    )
+    conn = transaction.get_connection(using)
+    if not conn.in_atomic_block:
+        ActionLog.objects.using(conn.alias).bulk_create([entry])
+        return
+    _pending_batch(conn).entries.append(entry)
+
+
+ARCHIVE_FIELDS = ('id', 'action', 'entity_type', 'entity_id', 'actor', 'data', 'payload', 'created_at')
+
+
+def prune_log(before, chunk_size=5000, archive=None, on_chunk=None):
+    """Delete ActionLog entries created before ``before``, oldest first, one
+    committed chunk at a time, so an interrupted run just resumes.
+
+    Each chunk is written to the text file ``archive`` as JSON lines before
+    it is deleted. Returns the number of entries removed.
+    """
+    # walking the primary key finds the oldest entries first, so each chunk
+    # stops early without an index on created_at alone
+    old = ActionLog.objects.filter(created_at__lt=before)
+
+    removed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.order_by('id').values(*ARCHIVE_FIELDS)[:chunk_size])
+            if not rows:
+                break
+            if archive is not None:
+                archive.writelines(json.dumps(r, cls=DjangoJSONEncoder) + '\n' for r in rows)
+                archive.flush()
+            ActionLog.objects.filter(id__in=[r['id'] for r in rows]).delete()
+        removed += len(rows)
+        if on_chunk:
+            on_chunk(removed)
+    return removed
@@ -0,0 +1,280 @@
+"""Benchmark scenarios for the fees views, driven through the Django test
+client against whatever database is configured (seed it first with
+``manage.py seed_fees``). Used by ``manage.py bench_fees``.
+
+Write scenarios (toggle_due, update_dues_safely, ...) run inside a
+transaction that is rolled back afterwards, so the fee data is left as it
+was; their timings leave out the final COMMIT. run_concurrent_writes needs
+real commits from several connections, so it only runs when asked to
+(``bench_fees --concurrency N --allow-writes``) and puts the dues it
+toggled back the way they were.
+
+run_http_load drives a running server over HTTP instead, to compare the
+WSGI deployment with the ASGI one (FEES_ASYNC_VIEWS=1) under concurrent
+clients.
+"""
+import math
+import statistics
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .ledger import refresh_ledgers
+from .models import Student, StudentDue
+
+# metric -> True when bigger is worse
+METRICS = {
+    'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'mean_ms': True,
+    'queries': True, 'bytes': True, 'peak_kb': True,
+    'writes_per_s': False, 'req_per_s': False, 'errors': True,
+}
+
+
+# scenarios that change fee data; run() rolls them back
+WRITE_SCENARIOS = {'update_dues_safely', 'toggle_due', 'toggle_due_partial'}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _content_length(response):
+    if getattr(response, 'streaming', False):
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Targets:
+    """Rows the scenarios operate on, picked once per run."""
+
+    def __init__(self):
+        self.student = (
+            Student.objects.filter(ledger__due_count__gt=0)
+            .order_by('-total_due_months', '-id').first()
+        )
+        if self.student is None:
+            raise ValueError("No students with dues; run 'manage.py seed_fees' first")
+        self.dues = list(self.student.dues.order_by('due_date', 'id'))
+        self.due = next((d for d in reversed(self.dues) if not d.paid), self.dues[-1])
+        self.search = self.student.name.split()[0]
+        months = self.student.total_due_months
+        n = Student.objects.filter(total_due_months=months).count()
+        self.deep_page = f"gp_{months}={max(1, math.ceil(n / 10))}"
+        self.toggle = 0
+
+    def edit_post(self):
+        self.toggle += 1
+        data = {
+            'name': self.student.name,
+            'total_due_months': self.student.total_due_months,
+        }
+        for i, d in enumerate(self.dues):
+            data[f'due_date_{i}'] = d.due_date.isoformat()
+            data[f'due_amount_{i}'] = str(d.amount + (self.toggle % 2))
+        return data
+
+
+def scenarios(targets):
+    s = targets.student
+    return {
+        'student_list': lambda c: (cache.clear(), c.get('/'))[1],
+        'student_list_cached': lambda c: c.get('/'),
+        'student_list_search': lambda c: (cache.clear(), c.get('/', {'q': targets.search}))[1],
+        'student_list_deep_page': lambda c: (cache.clear(), c.get(f'/?{targets.deep_page}'))[1],
+        'student_edit': lambda c: c.get(f'/edit/{s.id}/'),
+        'update_dues_safely': lambda c: c.post(f'/edit/{s.id}/', targets.edit_post()),
+        'toggle_due': lambda c: c.post(
+            f'/toggle_due/{targets.due.id}/', {'collected_by': 'Sam', 'payment_method': 'Cash'}
+        ),
+        'toggle_due_partial': lambda c: c.post(
+            f'/toggle_due/{targets.due.id}/', {'collected_by': 'Sam', 'payment_method': 'Cash'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        ),
+    }
+
+
+def run_scenario(fn, iterations=20, warmup=2):
+    client = Client()
+    for _ in range(warmup):
+        fn(client)
+
+    latencies, queries, sizes = [], [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = fn(client)
+            size = _content_length(response)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        queries.append(len(ctx))
+        sizes.append(size)
+
+    # memory is measured on a separate call; tracemalloc slows everything down
+    tracemalloc.start()
+    _content_length(fn(client))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'queries': statistics.median(queries),
+        'bytes': statistics.median(sizes),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(names=None, iterations=20, warmup=2):
+    targets = Targets()
+    available = scenarios(targets)
+    results = {}
+    for name in names or available:
+        if name in WRITE_SCENARIOS:
+            with transaction.atomic():
+                results[name] = run_scenario(available[name], iterations, warmup)
+                transaction.set_rollback(True)
+        else:
+            results[name] = run_scenario(available[name], iterations, warmup)
+    return {
+        'meta': {
+            'vendor': connection.vendor,
+            'students': Student.objects.count(),
+            'dues': StudentDue.objects.count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'scenarios': results,
+    }
+
+
+def compare(base, new, threshold=0.2):
+    """(scenario, metric, base value, new value, change) for every metric
+    that got worse by more than ``threshold`` (a fraction)."""
+    regressions = []
+    for name, new_metrics in new['scenarios'].items():
+        old_metrics = base['scenarios'].get(name)
+        if not old_metrics:
+            continue
+        for metric, worse_if_bigger in METRICS.items():
+            old, cur = old_metrics.get(metric), new_metrics.get(metric)
+            if old is None or cur is None:
+                continue
+            change = (cur - old) / old if old else (1.0 if cur else 0.0)
+            if (change if worse_if_bigger else -change) > threshold:
+                regressions.append((name, metric, old, cur, change))
+    return regressions
+
+
+def _restore_dues(dues):
+    """Put the payment fields of ``dues`` back and refresh their ledgers.
+
+    Stamped as changed now, so the changes feed and the collections rollup
+    see the restore too.
+    """
+    now = timezone.now()
+    for d in dues:
+        d.last_updated = now
+    with transaction.atomic():
+        StudentDue.objects.bulk_update(
+            dues, ['paid', 'paid_at', 'collected_by', 'payment_method', 'last_updated']
+        )
+        refresh_ledgers({d.student_id for d in dues})
+
+
+def run_concurrent_writes(workers=4, writes_per_worker=50):
+    """Throughput of toggle_due POSTs from ``workers`` parallel threads, each
+    with its own client and database connection (like gunicorn workers
+    sharing one SQLite file). The toggled dues are restored afterwards;
+    their audit entries stay."""
+    due_ids = list(
+        StudentDue.objects.order_by('-id').values_list('id', flat=True)[:workers * writes_per_worker]
+    )
+    if len(due_ids) < workers:
+        raise ValueError("Not enough dues to benchmark; run 'manage.py seed_fees' first")
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(ids):
+        client = Client(raise_request_exception=False)
+        local = []
+        try:
+            for due_id in ids:
+                start = time.perf_counter()
+                response = client.post(
+                    f'/toggle_due/{due_id}/', {'collected_by': 'Sam', 'payment_method': 'Cash'}
+                )
+                local.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    with lock:
+                        errors.append(response.status_code)
+        finally:
+            connections.close_all()
+        with lock:
+            latencies.extend(local)
+
+    chunks = [due_ids[i::workers] for i in range(workers)]
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    before = list(StudentDue.objects.filter(id__in=due_ids))
+    try:
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        _restore_dues(before)
+    return {
+        'workers': workers,
+        'writes': len(latencies),
+        'errors': len(errors),
+        'writes_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+    }
+
+
+def run_http_load(base_url, paths=('/',), clients=16, requests=200, timeout=30):
+    """Requests/second and latency of ``requests`` GETs spread over
+    ``clients`` concurrent connections, cycling through ``paths``."""
+    urls = [base_url.rstrip('/') + path for path in paths]
+
+    def fetch(i):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urls[i % len(urls)], timeout=timeout) as response:
+                response.read()
+                ok = response.status < 400
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [ms for ms, ok in results if ok]
+    return {
+        'clients': clients,
+        'requests': requests,
+        'errors': requests - len(latencies),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+    }
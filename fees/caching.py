@@ -0,0 +1,125 @@
+"""Conditional GET and whole-page caching for student_list.
+
+Both hang off one cheap data version: student count, max id and max
+last_updated of Student, the max StudentDue.last_updated, the max
+StudentLedger.updated_at (which also moves when dues are deleted) and
+today's date. Any write to the fees tables changes it, so a page cached
+under an old version is never served again and simply ages out of the
+cache (TIMEOUT / MAX_ENTRIES in settings.CACHES). Because the version is
+read from the database, this stays correct with a per-process local-memory
+cache under several gunicorn workers.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .fragments import ROW_TEMPLATE_VERSION
+from .models import Student, StudentDue, StudentLedger
+
+LIST_PARAMS = ('join_from', 'join_to', 'q', 'status', 'sort', 'group_page_size')
+PAGE_TIMEOUT = 60 * 10
+
+
+def _version(students, dues_changed, ledger_changed):
+    return '|'.join(str(v) for v in (
+        students['n'], students['max_id'], students['changed'],
+        dues_changed, ledger_changed, date.today(), ROW_TEMPLATE_VERSION,
+    ))
+
+
+def data_version():
+    return _version(
+        Student.objects.aggregate(n=Count('id'), max_id=Max('id'), changed=Max('last_updated')),
+        StudentDue.objects.aggregate(m=Max('last_updated'))['m'],
+        StudentLedger.objects.aggregate(m=Max('updated_at'))['m'],
+    )
+
+
+async def adata_version():
+    return _version(
+        await Student.objects.aaggregate(n=Count('id'), max_id=Max('id'), changed=Max('last_updated')),
+        (await StudentDue.objects.aaggregate(m=Max('last_updated')))['m'],
+        (await StudentLedger.objects.aaggregate(m=Max('updated_at')))['m'],
+    )
+
+
+def list_params(params):
+    """The query parameters that select what student_list shows, sorted."""
+    return sorted(
+        (k, v) for k in params for v in params.getlist(k)
+        if k in LIST_PARAMS or k.startswith('gp_')
+    )
+
+
+def _etag(version, request):
+    return hashlib.md5(f"{version}?{list_params(request.GET)}".encode()).hexdigest()
+
+
+def list_etag(request, *args, **kwargs):
+    if not hasattr(request, '_fees_list_etag'):
+        request._fees_list_etag = _etag(data_version(), request)
+    return request._fees_list_etag
+
+
+async def alist_etag(request, *args, **kwargs):
+    if not hasattr(request, '_fees_list_etag'):
+        request._fees_list_etag = _etag(await adata_version(), request)
+    return request._fees_list_etag
+
+
+def alist_condition(view):
+    """condition(etag_func=list_etag) for an async view: Django's decorator
+    calls the ETag function synchronously, which the async ORM can't do."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        etag = quote_etag(await alist_etag(request))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('ETag', etag)
+        return response
+    return wrapper
+
+
+def cache_list_page(view):
+    """Serve student_list from the cache while the data version and the
+    filter parameters are unchanged."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            key = f"fees:list:{await alist_etag(request)}"
+            content = await cache.aget(key)
+            if content is not None:
+                return HttpResponse(content)
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.content, PAGE_TIMEOUT)
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        key = f"fees:list:{list_etag(request)}"
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        if response.status_code == 200:
+            cache.set(key, response.content, PAGE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,94 @@
+"""SQLite production profile and lock handling.
+
+Every new SQLite connection is switched to WAL with synchronous=NORMAL, a
+busy timeout, mmap and a larger page cache (FEES_SQLITE_PRAGMAS overrides
+any of them). The busy timeout is the database's OPTIONS["timeout"]
+(SQLITE_TIMEOUT), so the PRAGMA and the driver agree on how long a writer
+waits for the lock. WAL lets readers carry on while one collector writes; the busy
+timeout makes writers queue instead of failing. A write can still get
+"database is locked" when it has to upgrade a read transaction, so the write
+views are wrapped in retry_on_db_lock, which re-runs them with backoff.
+"""
+import asyncio
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,          # KiB
+    'temp_store': 'MEMORY',
+}
+
+
+# sqlite3.connect()'s own default, in seconds
+DEFAULT_SQLITE_TIMEOUT = 5
+
+
+def sqlite_pragmas(settings_dict=None):
+    timeout = ((settings_dict or {}).get('OPTIONS') or {}).get('timeout', DEFAULT_SQLITE_TIMEOUT)
+    return {
+        **DEFAULT_SQLITE_PRAGMAS,
+        'busy_timeout': int(timeout * 1000),  # ms
+        **getattr(settings, 'FEES_SQLITE_PRAGMAS', {}),
+    }
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas(connection.settings_dict).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def retry_on_db_lock(view=None, *, attempts=5, backoff=0.05):
+    """Re-run a write view when SQLite reports the database as locked.
+
+    Only retries when the view is not already running inside a transaction,
+    so a retry always starts from a clean, rolled-back state. Async views
+    run their writes through sync_to_async, outside any transaction held by
+    the caller, and back off with asyncio.sleep.
+    """
+    def delay(attempt):
+        return backoff * 2 ** (attempt - 1) * (1 + random.random())
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                for attempt in range(1, attempts + 1):
+                    try:
+                        return await view(request, *args, **kwargs)
+                    except OperationalError as e:
+                        if attempt == attempts or not is_lock_error(e):
+                            raise
+                        await asyncio.sleep(delay(attempt))
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return view(request, *args, **kwargs)
+                except OperationalError as e:
+                    if attempt == attempts or connection.in_atomic_block or not is_lock_error(e):
+                        raise
+                    time.sleep(delay(attempt))
+        return wrapper
+    return decorator(view) if view else decorator
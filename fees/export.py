@@ -0,0 +1,78 @@
+"""Streaming CSV export of the fee ledger: one line per due (students
+without dues get one line with empty due columns).
+
+Archived students (fees.archive) follow the active ones, marked in the
+``archived`` column, so the export still reconciles with every payment
+ever taken; ``include_archived=False`` leaves them out.
+"""
+import csv
+from django.db.models import Q
+
+from .models import ArchivedStudent, Student
+from .queries import STATUSES, filter_students
+
+HEADER = [
+    'student_id', 'name', 'mobile', 'course', 'registration_date', 'joining_date',
+    'registration_fee', 'registration_fee_paid', 'total_due_months',
+    'due_id', 'due_date', 'amount', 'paid', 'collected_by', 'payment_method',
+    'last_updated', 'archived',
+]
+FIELDS = [
+    'id', 'name', 'mobile', 'course', 'registration_date', 'joining_date',
+    'registration_fee', 'registration_fee_paid', 'total_due_months',
+    'dues__id', 'dues__due_date', 'dues__amount', 'dues__paid',
+    'dues__collected_by', 'dues__payment_method', 'dues__last_updated',
+]
+# Excel only detects UTF-8 (names, the rupee sign) with a byte order mark
+EXCEL_BOM = '\ufeff'
+
+
+class Echo:
+    """File-like object whose write() just returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def archived_students(params):
+    """The student_list filters applied to ArchivedStudent, or None when they
+    exclude it: archived students have no search index row and no unpaid
+    dues, so ``q`` is a plain name / mobile match and only ?status=paid
+    keeps them."""
+    status = (params.get('status') or '').strip()
+    if status in STATUSES and status != 'paid':
+        return None
+    qs = ArchivedStudent.objects.all()
+    join_from = (params.get('join_from') or '').strip()
+    join_to = (params.get('join_to') or '').strip()
+    search = (params.get('q') or '').strip()
+    if join_from:
+        qs = qs.filter(joining_date__gte=join_from)
+    if join_to:
+        qs = qs.filter(joining_date__lte=join_to)
+    if search:
+        qs = qs.filter(Q(name__icontains=search) | Q(mobile__contains=search))
+    return qs
+
+
+def ledger_rows(params, chunk_size=2000, include_archived=True):
+    """Header plus one tuple per (student, due), read in chunks from a
+    server-side cursor so memory does not grow with the ledger size."""
+    querysets = [(filter_students(Student.objects.all(), params), False)]
+    if include_archived:
+        archived = archived_students(params)
+        if archived is not None:
+            querysets.append((archived, True))
+    yield HEADER
+    for qs, is_archived in querysets:
+        rows = qs.order_by('id', 'dues__due_date', 'dues__id').values_list(*FIELDS)
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield row + (is_archived,)
+
+
+def csv_lines(params, chunk_size=2000, excel=False, include_archived=True):
+    writer = csv.writer(Echo())
+    if excel:
+        yield EXCEL_BOM
+    for row in ledger_rows(params, chunk_size, include_archived):
+        yield writer.writerow(row)
@@ -0,0 +1,84 @@
+"""Per-student row fragments for student_list, cached under a version key.
+
+The key changes whenever the row could: Student.last_updated moves on every
+student save (student_edit, toggle_reg_fee) and StudentLedger.updated_at on
+every ledger refresh, which follows every dues write (toggle_due,
+update_dues_safely, bulk payments, ...). The date is part of the key because
+the overdue / due-today colouring depends on it. Stale versions are never
+read again and simply expire.
+
+arender_rows is the async version used by fees.async_views.
+"""
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import StudentDue
+
+ROW_TEMPLATE = 'fees/_student_row.html'
+# bump when _student_row.html (or anything it includes) changes
+ROW_TEMPLATE_VERSION = 3
+
+
+def _stamp(value):
+    return value.strftime('%Y%m%d%H%M%S%f') if value else '-'
+
+
+def row_cache_key(student, today):
+    return 'fees:row:%s:%s:%s:%s:%s' % (
+        ROW_TEMPLATE_VERSION,
+        student.id,
+        _stamp(student.last_updated),
+        _stamp(getattr(student, 'ledger_updated_at', None)),
+        today.isoformat(),
+    )
+
+
+def render_rows(students, build_row, today):
+    """{student id: row HTML} for ``students``.
+
+    Only the cache misses get their dues loaded and their row rendered via
+    ``build_row(student)``.
+    """
+    keys = {s.id: row_cache_key(s, today) for s in students}
+    cached = cache.get_many(list(keys.values()))
+    misses = [s for s in students if keys[s.id] not in cached]
+    if misses:
+        _prefetch_dues(misses)
+        rendered = _render(misses, keys, build_row, today)
+        cache.set_many(rendered, _timeout())
+        cached.update(rendered)
+    return {s.id: mark_safe(cached[keys[s.id]]) for s in students}
+
+
+async def arender_rows(students, build_row, today):
+    keys = {s.id: row_cache_key(s, today) for s in students}
+    cached = await cache.aget_many(list(keys.values()))
+    misses = [s for s in students if keys[s.id] not in cached]
+    if misses:
+        await sync_to_async(_prefetch_dues)(misses)
+        rendered = _render(misses, keys, build_row, today)
+        await cache.aset_many(rendered, _timeout())
+        cached.update(rendered)
+    return {s.id: mark_safe(cached[keys[s.id]]) for s in students}
+
+
+def _prefetch_dues(students):
+    prefetch_related_objects(
+        students, Prefetch('dues', queryset=StudentDue.objects.order_by('due_date'))
+    )
+
+
+def _render(students, keys, build_row, today):
+    return {
+        keys[s.id]: render_to_string(ROW_TEMPLATE, {'it': build_row(s), 'today': today})
+        for s in students
+    }
+
+
+def _timeout():
+    return getattr(settings, 'FEES_ROW_CACHE_TIMEOUT', 60 * 60 * 24)
@@ -0,0 +1,148 @@
+"""Streaming bulk import of students and their fee schedules.
+
+Rows come from a CSV or XLSX file, one at a time, and are validated with
+StudentForm. Valid rows are committed in batches: one bulk_create for the
+students, one for their dues, then the ledger and search index for the batch.
+Besides the StudentForm fields, a row may carry ``monthly_amount`` (used for
+every month) and/or per-month ``due_date_<i>`` / ``due_amount_<i>`` columns,
+numbered from 0 like the add form.
+"""
+import csv
+import io
+from datetime import date, datetime
+
+from django.db import transaction
+
+from .audit import audit
+from .forms import StudentForm
+from .ledger import refresh_ledgers
+from .models import Student, StudentDue
+from .schedule import build_dues
+from .search import index_students
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self, start_row=0):
+        self.created = 0
+        self.failed = 0
+        self.errors = []  # first MAX_REPORTED_ERRORS (row, message) pairs
+        self.last_committed_row = start_row
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_rows(fileobj, filename):
+    """Yield (row_number, dict) pairs from a binary CSV/XLSX file object.
+
+    Row numbers are 1-based data rows (the header is not counted).
+    """
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Reading .xlsx files needs the openpyxl package")
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [_cell(h).lower() for h in next(rows, ())]
+            for n, values in enumerate(rows, 1):
+                if not any(v not in (None, '') for v in values):
+                    continue
+                yield n, {h: _cell(v) for h, v in zip(header, values) if h}
+        finally:
+            wb.close()
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    reader.fieldnames = [(h or '').strip().lower() for h in reader.fieldnames or []]
+    for n, row in enumerate(reader, 1):
+        if not any((v or '').strip() for v in row.values() if isinstance(v, str)):
+            continue
+        yield n, {k: (v or '').strip() for k, v in row.items() if k and isinstance(v, str)}
+
+
+def _schedule_data(row, total):
+    monthly = row.get('monthly_amount', '')
+    if not monthly:
+        return row
+    data = dict(row)
+    for i in range(total):
+        data.setdefault(f'due_amount_{i}', monthly)
+        if not data[f'due_amount_{i}']:
+            data[f'due_amount_{i}'] = monthly
+    return data
+
+
+def _commit(batch, actor=''):
+    """Save one batch of (row_number, unsaved Student, row) atomically."""
+    with transaction.atomic():
+        students = Student.objects.bulk_create([s for _, s, _ in batch])
+        dues = []
+        for (_, _, row), s in zip(batch, students):
+            total = max(0, int(s.total_due_months or 0))
+            dues.extend(build_dues(s, _schedule_data(row, total), 0, total))
+        StudentDue.objects.bulk_create(dues, batch_size=1000)
+        refresh_ledgers([s.id for s in students])
+        index_students(students)
+        audit(
+            'import_students', entity_type='student', actor=actor,
+            first_row=batch[0][0], last_row=batch[-1][0],
+            student_ids=[s.id for s in students],
+        )
+
+
+def import_students(rows, batch_size=500, start_row=0, on_error=None, on_commit=None, actor=''):
+    """Validate and save ``rows`` (from read_rows) in batches of ``batch_size``.
+
+    Rows numbered ``start_row`` or lower are skipped, so an interrupted import
+    can resume from ``report.last_committed_row``. ``on_error(row, message)``
+    is called for every rejected row and ``on_commit(report)`` after every
+    committed batch.
+    """
+    report = ImportReport(start_row)
+    batch = []
+
+    def flush():
+        _commit(batch, actor)
+        report.created += len(batch)
+        report.last_committed_row = batch[-1][0]
+        batch.clear()
+        if on_commit:
+            on_commit(report)
+
+    for row_number, row in rows:
+        if row_number <= start_row:
+            continue
+        form = StudentForm(data=row)
+        if not form.is_valid():
+            message = '; '.join(
+                f"{field}: {' '.join(errs)}" for field, errs in form.errors.items()
+            )
+            report.add_error(row_number, message)
+            if on_error:
+                on_error(row_number, message)
+            continue
+        batch.append((row_number, form.save(commit=False), row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
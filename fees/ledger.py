@@ -0,0 +1,119 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Student, StudentDue, StudentLedger
+
+LEDGER_FIELDS = [
+    'due_count', 'paid_count', 'paid_amount', 'outstanding_amount',
+    'next_due', 'next_due_date', 'next_due_amount', 'overdue_count',
+    'as_of', 'updated_at',
+]
+
+
+def ledger_query(student_ids, today):
+    """Ledger figures computed from the dues table for ``student_ids``."""
+    next_due = (
+        StudentDue.objects
+        .filter(student=OuterRef('pk'), paid=False)
+        .order_by('due_date', 'id')
+    )
+    zero = Value(Decimal('0'))
+    return (
+        Student.objects
+        .filter(id__in=student_ids)
+        .order_by()
+        .annotate(
+            l_due_count=Count('dues'),
+            l_paid_count=Count('dues', filter=Q(dues__paid=True)),
+            l_paid_amount=Coalesce(Sum('dues__amount', filter=Q(dues__paid=True)), zero),
+            l_outstanding_amount=Coalesce(Sum('dues__amount', filter=Q(dues__paid=False)), zero),
+            l_overdue_count=Count('dues', filter=Q(dues__paid=False, dues__due_date__lt=today)),
+            l_next_due_id=Subquery(next_due.values('id')[:1]),
+            l_next_due_date=Subquery(next_due.values('due_date')[:1]),
+            l_next_due_amount=Subquery(next_due.values('amount')[:1]),
+        )
+        .values(
+            'id', 'l_due_count', 'l_paid_count', 'l_paid_amount',
+            'l_outstanding_amount', 'l_overdue_count', 'l_next_due_id',
+            'l_next_due_date', 'l_next_due_amount',
+        )
+    )
+
+
+def _ledger_from_row(row, today, now):
+    return StudentLedger(
+        student_id=row['id'],
+        due_count=row['l_due_count'],
+        paid_count=row['l_paid_count'],
+        paid_amount=row['l_paid_amount'],
+        outstanding_amount=row['l_outstanding_amount'],
+        next_due_id=row['l_next_due_id'],
+        next_due_date=row['l_next_due_date'],
+        next_due_amount=row['l_next_due_amount'],
+        overdue_count=row['l_overdue_count'],
+        as_of=today,
+        updated_at=now,
+    )
+
+
+def refresh_ledgers(student_ids, today=None):
+    """Recompute and upsert the ledger rows of ``student_ids``.
+
+    Call it inside the same transaction as the StudentDue writes it follows.
+    Costs one aggregate query and one upsert regardless of how many dues the
+    students have.
+    """
+    student_ids = {int(i) for i in student_ids}
+    if not student_ids:
+        return []
+    today = today or date.today()
+    now = timezone.now()
+    ledgers = [_ledger_from_row(r, today, now) for r in ledger_query(student_ids, today)]
+    StudentLedger.objects.bulk_create(
+        ledgers,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=LEDGER_FIELDS,
+    )
+    return ledgers
+
+
+def find_drift(student_ids, today=None):
+    """Ledger rows that disagree with the dues table, as (student_id, field, stored, actual)."""
+    today = today or date.today()
+    stored = {
+        l.student_id: l
+        for l in StudentLedger.objects.filter(student_id__in=student_ids)
+    }
+    drift = []
+    for row in ledger_query(student_ids, today):
+        actual = _ledger_from_row(row, today, None)
+        ledger = stored.get(row['id'])
+        if ledger is None:
+            drift.append((row['id'], 'missing', None, None))
+            continue
+        for field in LEDGER_FIELDS:
+            if field in ('as_of', 'updated_at'):
+                continue
+            attname = 'next_due_id' if field == 'next_due' else field
+            if field == 'overdue_count' and ledger.as_of != today:
+                continue
+            if getattr(ledger, attname) != getattr(actual, attname):
+                drift.append((row['id'], field, getattr(ledger, attname), getattr(actual, attname)))
+    return drift
+
+
+def ledger_totals():
+    """Expressions exposing the ledger under the names student_list uses."""
+    zero = Value(Decimal('0'))
+    return {
+        'completed': Coalesce(F('ledger__paid_count'), 0),
+        'total_paid': Coalesce(F('ledger__paid_amount'), zero),
+        'total_due': Coalesce(F('ledger__outstanding_amount'), zero),
+        'oldest_unpaid_id': F('ledger__next_due_id'),
+        'ledger_updated_at': F('ledger__updated_at'),
+    }
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fees.archive import archive, archive_candidates, archive_cutoff, restore_student
+from fees.models import ArchivedStudent
+
+
+class Command(BaseCommand):
+    help = "Move fully paid students whose course has ended to the archive tables, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after-days', type=int,
+                            help="Archive once the last due is this many days old "
+                                 "(default FEES_ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the students to archive.")
+        parser.add_argument('--restore', type=int, nargs='+', metavar='ID',
+                            help="Bring these archived students back instead.")
+
+    def handle(self, *args, after_days=None, chunk_size=500, dry_run=False, restore=None, **options):
+        if restore:
+            for student_id in restore:
+                try:
+                    student = restore_student(student_id, actor='manage.py archive_students')
+                except ArchivedStudent.DoesNotExist:
+                    raise CommandError(f"No archived student with id {student_id}")
+                self.stdout.write(f"Restored {student.id} {student.name}")
+            return
+
+        cutoff = archive_cutoff(days=after_days)
+        if dry_run:
+            n = archive_candidates(cutoff).count()
+            self.stdout.write(f"{n} students finished before {cutoff} would be archived")
+            return
+
+        progress = (lambda n: self.stdout.write(f"  {n} archived")) if options['verbosity'] > 1 else None
+        archived = archive(cutoff, chunk_size, actor='manage.py archive_students', on_chunk=progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} students finished before {cutoff}"))
@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fees import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the fees views (latency percentiles, query counts, response "
+        "bytes, peak memory), load a running server over HTTP (--url), or "
+        "compare two saved runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="Run only this scenario (repeatable).")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', '-o', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                            help="Compare two result files instead of running.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed relative slowdown before --compare fails (default 0.2).")
+        parser.add_argument('--concurrency', type=int, metavar='WORKERS',
+                            help="Also measure toggle_due write throughput from this many parallel workers.")
+        parser.add_argument('--writes', type=int, default=50,
+                            help="Writes per worker for --concurrency (default 50).")
+        parser.add_argument('--allow-writes', action='store_true',
+                            help="Let --concurrency commit toggle_due writes to this database "
+                                 "(the dues are restored afterwards). Use a seeded copy, not live data.")
+        parser.add_argument('--url',
+                            help="Load this running server instead (e.g. http://127.0.0.1:8000), "
+                                 "with --concurrency clients (default 16).")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request with --url (repeatable, default /).")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Total requests for --url (default 200).")
+
+    def handle(self, *args, scenarios=None, iterations=20, warmup=2, output=None,
+               compare=None, threshold=0.2, concurrency=None, writes=50, allow_writes=False,
+               url=None, paths=None, requests=200, **options):
+        if compare:
+            return self._compare(*compare, threshold)
+        if url:
+            return self._load(url, paths or ['/'], concurrency or 16, requests, output)
+        if concurrency and not allow_writes:
+            raise CommandError(
+                "--concurrency commits real writes; run it against a seeded database "
+                "and pass --allow-writes"
+            )
+
+        try:
+            results = bench.run(scenarios, iterations, warmup)
+        except (KeyError, ValueError, RuntimeError) as e:
+            raise CommandError(f"Benchmark failed: {e}")
+
+        meta = results['meta']
+        self.stdout.write(f"{meta['vendor']}: {meta['students']} students, {meta['dues']} dues")
+        self.stdout.write(f"{'scenario':<26}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'bytes':>10}{'peak kB':>10}")
+        for name, r in results['scenarios'].items():
+            if 'writes_per_s' in r:
+                continue
+            self.stdout.write(
+                f"{name:<26}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+                f"{r['queries']:>9}{r['bytes']:>10}{r['peak_kb']:>10}"
+            )
+        if concurrency:
+            try:
+                r = bench.run_concurrent_writes(concurrency, writes)
+            except ValueError as e:
+                raise CommandError(f"Benchmark failed: {e}")
+            results['scenarios'][f'concurrent_toggle_due_x{concurrency}'] = r
+            self.stdout.write(
+                f"concurrent toggle_due x{concurrency}: {r['writes']} writes, "
+                f"{r['writes_per_s']} writes/s, p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, "
+                f"{r['errors']} errors"
+            )
+        if output:
+            with open(output, 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {output}")
+
+    def _load(self, url, paths, clients, requests, output):
+        r = bench.run_http_load(url, paths, clients, requests)
+        self.stdout.write(
+            f"{url} x{clients}: {r['requests']} requests, {r['req_per_s']} req/s, "
+            f"p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, {r['errors']} errors"
+        )
+        if output:
+            with open(output, 'w') as fh:
+                json.dump({'meta': {'url': url, 'paths': paths}, 'scenarios': {'http_load': r}}, fh, indent=2)
+            self.stdout.write(f"Results written to {output}")
+
+    def _compare(self, base_path, new_path, threshold):
+        with open(base_path) as fh:
+            base = json.load(fh)
+        with open(new_path) as fh:
+            new = json.load(fh)
+        regressions = bench.compare(base, new, threshold)
+        for name, metric, old, cur, change in regressions:
+            self.stdout.write(f"{name}.{metric}: {old} -> {cur} ({change:+.0%})")
+        if regressions:
+            raise CommandError(f"{len(regressions)} metric(s) regressed by more than {threshold:.0%}")
+        self.stdout.write(self.style.SUCCESS("No regressions"))
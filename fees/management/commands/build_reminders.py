@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from fees.reminders import build_outbox
+
+
+class Command(BaseCommand):
+    help = "Render WhatsApp reminders for overdue dues into the reminder outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=0,
+                            help="Also remind dues falling due within this many days.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running, rebuilding every INTERVAL seconds.")
+
+    def handle(self, *args, ahead=0, batch_size=500, interval=0, **options):
+        while True:
+            dropped, created = build_outbox(ahead=ahead, batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Outbox: {created} reminder(s) rendered, {dropped} stale dropped"
+            ))
+            if not interval:
+                return
+            connections.close_all()
+            time.sleep(interval)
@@ -0,0 +1,88 @@
+import re
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+
+from fees.api import api_queryset, keyset_page
+from fees.ledger import ledger_query
+from fees.models import CollectionRollup, Student, StudentDue
+from fees.queries import filter_students, student_queryset
+from fees.reminders import outbox_candidates
+from fees.sync import stream_queryset
+
+# "SCAN fees_x" with no index is a full table scan in SQLite's plan output;
+# PostgreSQL reports the same thing as "Seq Scan on fees_x".
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (fees_\w+)(?! USING| VIRTUAL)')
+PG_FULL_SCAN = re.compile(r'Seq Scan on (fees_\w+)')
+
+
+def hot_queries():
+    """The student_list, student_edit, toggle_due, API, changes feed,
+    reminder outbox and collections report queries, as (label, queryset)."""
+    student = Student.objects.order_by('id').first()
+    student_id = student.id if student else 0
+    due_id = StudentDue.objects.order_by('id').values_list('id', flat=True).first() or 0
+    filtered = QueryDict(mutable=True)
+    filtered.update({'join_from': '2025-01-01', 'join_to': '2025-12-31'})
+    overdue = QueryDict('status=overdue&sort=overdue_amount')
+    months = student.total_due_months if student else 0
+    since = datetime(2025, 1, 1)
+    return [
+        ('student_list: group counts', filter_students(Student.objects.all(), filtered)
+            .order_by().values('total_due_months')),
+        ('student_list: group page', student_queryset(QueryDict()).filter(total_due_months=months)[:10]),
+        ('student_list: joining date filter', student_queryset(filtered).filter(total_due_months=months)[:10]),
+        ('student_list: overdue group counts', filter_students(Student.objects.all(), overdue)
+            .order_by().values('total_due_months')),
+        ('student_list: overdue by amount', student_queryset(overdue).filter(total_due_months=months)[:10]),
+        ('student_list: page dues', StudentDue.objects.filter(student_id__in=[student_id]).order_by('due_date')),
+        ('student_edit: student', Student.objects.filter(pk=student_id)),
+        ('student_edit: dues', StudentDue.objects.filter(student_id=student_id).order_by('due_date')),
+        ('toggle_due: due', StudentDue.objects.filter(pk=due_id)),
+        ('toggle_due: ledger refresh', ledger_query([student_id], date.today())),
+        ('overdue dues', StudentDue.objects.filter(paid=False, due_date__lt=date.today())),
+        ('build_reminders: candidates', outbox_candidates()),
+        ('collections report: year to date', CollectionRollup.objects.filter(
+            month__gte=date(date.today().year, 1, 1), month__lte=date.today())),
+        ('api: months keyset page', keyset_page(
+            api_queryset(QueryDict(), 'months'), 'months', (months, student_id), 51)),
+        ('api: next_due keyset page', keyset_page(
+            api_queryset(QueryDict(), 'next_due'), 'next_due', (date.today(), student_id), 51)),
+    ] + [
+        (f'changes feed: {name}', stream_queryset(name, (since, 0), datetime.now())[:501])
+        for name in ('students', 'dues', 'deleted')
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot fees queries and fail if any of them needs a full table scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan.")
+
+    def handle(self, *args, verbose_plans=False, **options):
+        if connection.vendor == 'postgresql':
+            pattern = PG_FULL_SCAN
+            # tiny tables are always seq-scanned; force the planner to show
+            # whether an index path exists at all
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        elif connection.vendor == 'sqlite':
+            pattern = SQLITE_FULL_SCAN
+        else:
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        failures = []
+        for label, qs in hot_queries():
+            plan = qs.explain()
+            scans = pattern.findall(plan)
+            if verbose_plans or scans:
+                self.stdout.write(f"-- {label}\n{plan}\n")
+            if scans:
+                failures.append(f"{label}: full scan of {', '.join(sorted(set(scans)))}")
+
+        if failures:
+            raise CommandError("Query plan regression:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes"))
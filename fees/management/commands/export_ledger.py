@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fees.export import csv_lines
+from fees.queries import check_filter_dates
+
+
+class Command(BaseCommand):
+    help = "Write the fee ledger (students x dues) as CSV, streaming from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="File to write (default: stdout).")
+        parser.add_argument('--join-from')
+        parser.add_argument('--join-to')
+        parser.add_argument('--q', help="Same search as the student list.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--excel', action='store_true',
+                            help="Prefix a UTF-8 byte order mark for Excel.")
+        parser.add_argument('--exclude-archived', action='store_true',
+                            help="Leave out archived students (included by default).")
+
+    def handle(self, *args, output=None, chunk_size=2000, excel=False, exclude_archived=False, **options):
+        params = {'join_from': options['join_from'], 'join_to': options['join_to'], 'q': options['q']}
+        try:
+            check_filter_dates(params)
+        except ValueError as e:
+            raise CommandError(e)
+        out = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+        try:
+            for line in csv_lines(params, chunk_size, excel, include_archived=not exclude_archived):
+                out.write(line)
+        finally:
+            if output:
+                out.close()
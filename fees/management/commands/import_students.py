@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fees.importer import import_students, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import students and their fee schedules from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--start-row', type=int, default=0,
+                            help="Skip data rows up to and including this number.")
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue after the last row recorded in the checkpoint file.")
+        parser.add_argument('--checkpoint',
+                            help="Checkpoint file (default: <path>.checkpoint).")
+
+    def handle(self, *args, path, batch_size, start_row, resume, checkpoint, **options):
+        checkpoint = checkpoint or f"{path}.checkpoint"
+        if resume and os.path.exists(checkpoint):
+            with open(checkpoint) as fh:
+                start_row = max(start_row, int(fh.read().strip() or 0))
+            self.stdout.write(f"Resuming after row {start_row}")
+
+        def on_error(row_number, message):
+            self.stderr.write(f"row {row_number}: {message}")
+
+        def on_commit(report):
+            with open(checkpoint, 'w') as fh:
+                fh.write(str(report.last_committed_row))
+            self.stdout.write(f"committed through row {report.last_committed_row} ({report.created} students)")
+
+        try:
+            with open(path, 'rb') as fh:
+                report = import_students(
+                    read_rows(fh, path), batch_size=batch_size, start_row=start_row,
+                    on_error=on_error, on_commit=on_commit,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if os.path.exists(checkpoint) and not report.failed:
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} students, {report.failed} row(s) rejected"
+        ))
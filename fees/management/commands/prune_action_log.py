@@ -0,0 +1,48 @@
+import gzip
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from fees.audit import prune_log
+from fees.models import ActionLog
+
+
+class Command(BaseCommand):
+    help = "Delete (and optionally archive) ActionLog entries older than the retention period, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'FEES_AUDIT_RETENTION_DAYS', 365),
+                            help="Keep this many days of entries (default FEES_AUDIT_RETENTION_DAYS).")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--archive', metavar='FILE',
+                            help="Append the pruned entries to FILE as JSON lines (.gz to compress).")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be pruned.")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="VACUUM an SQLite database afterwards so the file shrinks.")
+
+    def handle(self, *args, days=365, chunk_size=5000, archive=None, dry_run=False, vacuum=False, **options):
+        before = timezone.now() - timedelta(days=days)
+        if dry_run:
+            n = ActionLog.objects.filter(created_at__lt=before).count()
+            self.stdout.write(f"{n} entries older than {before:%Y-%m-%d} would be pruned")
+            return
+
+        fh = None
+        if archive:
+            opener = gzip.open if archive.endswith('.gz') else open
+            fh = opener(archive, 'at', encoding='utf-8')
+        try:
+            progress = (lambda n: self.stdout.write(f"  {n} pruned")) if options['verbosity'] > 1 else None
+            removed = prune_log(before, chunk_size, fh, on_chunk=progress)
+        finally:
+            if fh:
+                fh.close()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {removed} entries older than {before:%Y-%m-%d}"))
+
+        if vacuum and removed and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write("Vacuumed the database")
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from fees.sync import prunable_tombstones, prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete changes-feed tombstones older than the retention period, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'FEES_TOMBSTONE_RETENTION_DAYS', 90),
+                            help="Keep this many days of tombstones (default FEES_TOMBSTONE_RETENTION_DAYS).")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be pruned.")
+
+    def handle(self, *args, days=90, chunk_size=5000, dry_run=False, **options):
+        before = timezone.now() - timedelta(days=days)
+        if dry_run:
+            n = prunable_tombstones(before).count()
+            self.stdout.write(f"{n} tombstones older than {before:%Y-%m-%d} would be pruned")
+            return
+        progress = (lambda n: self.stdout.write(f"  {n} pruned")) if options['verbosity'] > 1 else None
+        removed = prune_tombstones(before, chunk_size, on_chunk=progress)
+        self.stdout.write(self.style.SUCCESS(f"Pruned {removed} tombstones older than {before:%Y-%m-%d}"))
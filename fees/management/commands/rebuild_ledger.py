@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from fees.ledger import find_drift, refresh_ledgers
+from fees.models import Student
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-student fee ledger from the dues table, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report ledger rows that disagree with the dues; exit 1 on drift.")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, check=False, chunk_size=500, **options):
+        ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+        drifted = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            if check:
+                for student_id, field, stored, actual in find_drift(chunk):
+                    drifted += 1
+                    self.stdout.write(f"student {student_id}: {field} stored={stored} actual={actual}")
+            else:
+                with transaction.atomic():
+                    refresh_ledgers(chunk)
+        if check:
+            if drifted:
+                raise CommandError(f"{drifted} ledger value(s) out of date")
+            self.stdout.write(self.style.SUCCESS(f"Ledger consistent for {len(ids)} students"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt ledger for {len(ids)} students"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from fees.models import Student
+from fees.search import FTS_TABLE, fts_available, index_students
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 student search index from the Student table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size=1000, **options):
+        if not fts_available():
+            self.stdout.write("No FTS5 search table on this database; nothing to rebuild.")
+            return
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch, total = [], 0
+            for s in Student.objects.only('id', 'name', 'mobile').iterator(chunk_size=chunk_size):
+                batch.append(s)
+                if len(batch) >= chunk_size:
+                    index_students(batch)
+                    total += len(batch)
+                    batch = []
+            index_students(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} students"))
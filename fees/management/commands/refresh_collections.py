@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from fees.rollup import find_drift, rebuild_rollup, refresh_rollup
+
+
+class Command(BaseCommand):
+    help = "Bring the monthly collections rollup up to date with the dues changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Drop the rollup and build it again from every due.")
+        parser.add_argument('--check', action='store_true',
+                            help="Only compare the rollup with a full recount; exit 1 on drift.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running, refreshing every INTERVAL seconds.")
+
+    def handle(self, *args, rebuild=False, check=False, batch_size=2000, interval=0, **options):
+        if check:
+            drift = find_drift()
+            for (month, collected_by, payment_method), measure, stored, actual in drift:
+                self.stdout.write(
+                    f"{month:%Y-%m} {collected_by or '-'} {payment_method or '-'}: "
+                    f"{measure} stored={stored} actual={actual}"
+                )
+            if drift:
+                raise CommandError(f"{len(drift)} rollup value(s) out of date")
+            self.stdout.write(self.style.SUCCESS("Collections rollup consistent"))
+            return
+
+        if rebuild:
+            changed, removed = rebuild_rollup(batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt collections rollup from {changed} dues"))
+            return
+
+        while True:
+            changed, removed = refresh_rollup(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Collections rollup: {changed} changed due(s), {removed} deleted"
+            ))
+            if not interval:
+                return
+            connections.close_all()
+            time.sleep(interval)
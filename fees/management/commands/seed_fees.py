@@ -0,0 +1,97 @@
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fees.ledger import refresh_ledgers
+from fees.models import Student, StudentDue
+from fees.schedule import generate_schedule
+from fees.search import index_students
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Akash', 'Ananya', 'Arjun', 'Bhavana', 'Deepak', 'Divya',
+    'Ganesh', 'Harini', 'Karthik', 'Kavya', 'Lakshmi', 'Manoj', 'Meena', 'Naveen',
+    'Priya', 'Rahul', 'Ramya', 'Sanjay', 'Sneha', 'Suresh', 'Swathi', 'Vignesh',
+]
+LAST_NAMES = [
+    'Kumar', 'Reddy', 'Sharma', 'Iyer', 'Nair', 'Rao', 'Patel', 'Krishnan',
+    'Menon', 'Pillai', 'Gupta', 'Das', 'Shetty', 'Naidu', 'Varma', 'Joshi',
+]
+COURSES = ['Python Full Stack', 'Java Full Stack', 'Data Science', 'AI & ML', 'Web Design', 'Testing']
+COLLECTORS = ['Sam', 'Sree', 'Bj']
+METHODS = ['GPay', 'Cash']
+
+
+class Command(BaseCommand):
+    help = "Generate realistic synthetic students and fee schedules (deterministic per --seed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--min-months', type=int, default=3)
+        parser.add_argument('--max-months', type=int, default=24)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help="Delete all students first.")
+
+    def handle(self, *args, students, min_months, max_months, seed, batch_size, clear, **options):
+        rng = random.Random(seed)
+        today = date.today()
+        if clear:
+            Student.objects.all().delete()
+
+        created = dues_created = 0
+        while created < students:
+            size = min(batch_size, students - created)
+            batch = [self._student(rng, today, min_months, max_months) for _ in range(size)]
+            with transaction.atomic():
+                batch = Student.objects.bulk_create(batch)
+                dues = []
+                for s in batch:
+                    dues.extend(self._dues(rng, s, today))
+                StudentDue.objects.bulk_create(dues, batch_size=2000)
+                refresh_ledgers([s.id for s in batch], today)
+                index_students(batch)
+            created += size
+            dues_created += len(dues)
+            self.stdout.write(f"{created} students, {dues_created} dues")
+        self.stdout.write(self.style.SUCCESS(f"Seeded {created} students and {dues_created} dues"))
+
+    def _student(self, rng, today, min_months, max_months):
+        joining = today - timedelta(days=rng.randint(0, 730))
+        return Student(
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            mobile=f"{rng.randint(6, 9)}{rng.randint(0, 10**9 - 1):09d}",
+            course=rng.choice(COURSES),
+            registration_date=joining - timedelta(days=rng.randint(0, 30)),
+            joining_date=joining,
+            registration_fee=Decimal(rng.choice([500, 1000, 1500])),
+            registration_fee_paid=rng.random() < 0.9,
+            total_due_months=rng.randint(min_months, max_months),
+        )
+
+    def _dues(self, rng, student, today):
+        amount = Decimal(rng.choice(range(1000, 5001, 500)))
+        # most students pay on time; some fall a few months behind
+        behind = rng.choice([0, 0, 0, 1, 1, 2, 3])
+        schedule = generate_schedule(student.joining_date, student.total_due_months)
+        past = sum(1 for d in schedule if d <= today)
+        dues = []
+        for i, due_date in enumerate(schedule):
+            paid = i < past - behind
+            due = StudentDue(
+                student=student,
+                due_date=due_date,
+                amount=amount,
+                paid=paid,
+                collected_by=rng.choice(COLLECTORS) if paid else None,
+                payment_method=rng.choice(METHODS) if paid else None,
+            )
+            if paid:
+                # bulk_create skips StudentDue.save(), which stamps paid_at;
+                # payments come in within a week of the due date
+                paid_on = min(today, due_date + timedelta(days=rng.randint(0, 7)))
+                due.paid_at = datetime.combine(paid_on, time(rng.randint(9, 19), rng.randint(0, 59)))
+            dues.append(due)
+        return dues
@@ -0,0 +1,142 @@
+"""Per-request SQL and render instrumentation.
+
+ServerTimingMiddleware counts queries and their time through
+connection.execute_wrapper, times template rendering separately from the
+rest of the view, and reports both in a Server-Timing header (visible in the
+browser dev tools' network panel). Requests slower than
+FEES_SLOW_REQUEST_MS or running more than FEES_QUERY_BUDGET queries are
+logged to the "fees.slow_requests" logger with the view name, the query
+parameters and the most repeated SQL statements, which is where N+1
+patterns show up.
+
+Under ASGI the async ORM runs queries in the request's sync_to_async
+thread, so the wrapper is installed on that thread's connection.
+"""
+import contextvars
+import logging
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger('fees.slow_requests')
+
+_current = contextvars.ContextVar('fees_request_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+
+    # connection.execute_wrapper hook
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def repeated(self, n=5):
+        return [(count, sql) for sql, count in self.statements.most_common(n) if count > 1]
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timing.template_ms += (time.perf_counter() - start) * 1000
+    wrapper._fees_timed = True
+    return wrapper
+
+
+def _install_template_timer():
+    # only top-level renders go through the backend Template; {% include %}
+    # renders inside it, so nothing is counted twice
+    if not getattr(DjangoTemplate.render, '_fees_timed', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def _add_wrapper(timing):
+    connection.execute_wrappers.append(timing)
+
+
+def _remove_wrapper(timing):
+    connection.execute_wrappers.remove(timing)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'FEES_SLOW_REQUEST_MS', 500)
+        self.query_budget = getattr(settings, 'FEES_QUERY_BUDGET', 50)
+        _install_template_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timing):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timing, start)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        await sync_to_async(_add_wrapper)(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(timing)
+            _current.reset(token)
+        return self.report(request, response, timing, start)
+
+    def report(self, request, response, timing, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        view_ms = max(0.0, total_ms - timing.template_ms)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_ms:.1f};desc="{timing.queries} queries"',
+            f'view;dur={view_ms:.1f}',
+            f'tpl;dur={timing.template_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        if total_ms > self.slow_ms or timing.queries > self.query_budget:
+            match = getattr(request, 'resolver_match', None)
+            logger.warning(
+                "slow request %s %s view=%s params=%s total=%.1fms db=%.1fms "
+                "queries=%d template=%.1fms repeated=%s",
+                request.method, request.path,
+                match.view_name if match else '-',
+                dict(request.GET.lists()),
+                total_ms, timing.db_ms, timing.queries, timing.template_ms,
+                timing.repeated(),
+            )
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:35
+
+import django.db.models.deletion
+from datetime import date
+
+from django.db import migrations, models
+
+
+def populate_ledgers(apps, schema_editor):
+    Student = apps.get_model('fees', 'Student')
+    StudentLedger = apps.get_model('fees', 'StudentLedger')
+    today = date.today()
+    ledgers = []
+    for s in Student.objects.prefetch_related('dues'):
+        dues = sorted(s.dues.all(), key=lambda d: (d.due_date, d.id))
+        unpaid = [d for d in dues if not d.paid]
+        ledgers.append(StudentLedger(
+            student_id=s.id,
+            due_count=len(dues),
+            paid_count=len(dues) - len(unpaid),
+            paid_amount=sum((d.amount for d in dues if d.paid), 0),
+            outstanding_amount=sum((d.amount for d in unpaid), 0),
+            next_due_id=unpaid[0].id if unpaid else None,
+            next_due_date=unpaid[0].due_date if unpaid else None,
+            next_due_amount=unpaid[0].amount if unpaid else None,
+            overdue_count=sum(1 for d in unpaid if d.due_date < today),
+            as_of=today,
+        ))
+    StudentLedger.objects.bulk_create(ledgers, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0007_remove_studentdue_updated_at_studentdue_last_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentLedger',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger', serialize=False, to='fees.student')),
+                ('due_count', models.IntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('next_due_date', models.DateField(blank=True, null=True)),
+                ('next_due_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('overdue_count', models.IntegerField(default=0)),
+                ('as_of', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('next_due', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='fees.studentdue')),
+            ],
+        ),
+        migrations.RunPython(populate_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from fees.search import (
+    FTS_TABLE, create_search_index, drop_search_index, normalize_mobile,
+)
+
+
+def forwards(apps, schema_editor):
+    if not create_search_index(schema_editor):
+        return
+    Student = apps.get_model('fees', 'Student')
+    rows = []
+    for s in Student.objects.only('id', 'name', 'mobile').iterator():
+        mobile = normalize_mobile(s.mobile)
+        rows.append((s.id, s.name, mobile, mobile[::-1]))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, mobile, mobile_rev) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0008_studentledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0009_student_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['joining_date'], name='fees_student_joining_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['total_due_months', '-id'], name='fees_student_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(fields=['student', 'due_date'], name='fees_due_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(fields=['paid', 'due_date'], name='fees_due_paid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['student', 'due_date'], name='fees_due_unpaid_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['due_date'], name='fees_due_unpaid_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0011_student_last_updated'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentledger',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['last_updated'], name='fees_student_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(fields=['last_updated'], name='fees_due_updated_idx'),
+        ),
+    ]
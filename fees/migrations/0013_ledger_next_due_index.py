@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0012_last_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentledger',
+            index=models.Index(fields=['next_due_date', 'student'], name='fees_ledger_next_due_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0014_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentdue',
+            index=models.Index(fields=['due_date'], name='fees_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0015_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionlog',
+            name='actor',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='actionlog',
+            name='data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='actionlog',
+            name='entity_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='actionlog',
+            name='entity_type',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['action', 'created_at'], name='fees_log_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='actionlog',
+            index=models.Index(fields=['entity_type', 'entity_id'], name='fees_log_entity_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0016_structured_action_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mobile', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('opened', 'Opened')], default='pending', max_length=10)),
+                ('rendered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('opened_at', models.DateTimeField(blank=True, null=True)),
+                ('due', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reminder', to='fees.studentdue')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='fees.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status'], name='fees_reminder_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+def backfill_paid_at(apps, schema_editor):
+    # the payment time was never recorded; last_updated is the closest stamp
+    StudentDue = apps.get_model('fees', 'StudentDue')
+    StudentDue.objects.filter(paid=True).update(paid_at=models.F('last_updated'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0017_reminder_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionEntry',
+            fields=[
+                ('due_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('student_id', models.IntegerField(db_index=True)),
+                ('due_month', models.DateField()),
+                ('paid_month', models.DateField(blank=True, null=True)),
+                ('collected_by', models.CharField(blank=True, default='', max_length=50)),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('paid', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CollectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('collected_by', models.CharField(blank=True, default='', max_length=50)),
+                ('payment_method', models.CharField(blank=True, default='', max_length=20)),
+                ('expected_count', models.IntegerField(default=0)),
+                ('expected_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected_count', models.IntegerField(default=0)),
+                ('collected_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('outstanding_count', models.IntegerField(default=0)),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('upto', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studentdue',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='collectionrollup',
+            constraint=models.UniqueConstraint(fields=('month', 'collected_by', 'payment_method'), name='fees_rollup_key'),
+        ),
+        migrations.RunPython(backfill_paid_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fees', '0018_collections_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStudent',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('mobile', models.CharField(max_length=20)),
+                ('course', models.CharField(max_length=200)),
+                ('registration_date', models.DateField()),
+                ('joining_date', models.DateField()),
+                ('registration_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('registration_fee_paid', models.BooleanField(default=False)),
+                ('total_due_months', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedDue',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('due_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('paid', models.BooleanField(default=False)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('last_updated', models.DateTimeField()),
+                ('collected_by', models.CharField(blank=True, max_length=50, null=True)),
+                ('payment_method', models.CharField(blank=True, max_length=20, null=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dues', to='fees.archivedstudent')),
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+from urllib.parse import quote_from_bytes
+
 from django.db import models
 class Student(models.Model):
     name = models.CharField(max_length=200)
@@ -8,6 +10,16 @@ class Student(models.Model):
     registration_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     registration_fee_paid = models.BooleanField(default=False)
     total_due_months = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['joining_date'], name='fees_student_joining_idx'),
+            # student_list pages each total_due_months group newest-first
+            models.Index(fields=['total_due_months', '-id'], name='fees_student_group_idx'),
+            models.Index(fields=['last_updated'], name='fees_student_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 # class StudentDue(models.Model):
@@ -28,6 +40,8 @@ class StudentDue(models.Model):
     due_date = models.DateField()
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     paid = models.BooleanField(default=False)
+    # when the due was marked paid; the collections rollup counts it in this month
+    paid_at = models.DateTimeField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
 
     # NEW FIELDS
@@ -51,10 +65,226 @@ class StudentDue(models.Model):
         null=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'due_date'], name='fees_due_student_date_idx'),
+            models.Index(fields=['paid', 'due_date'], name='fees_due_paid_date_idx'),
+            models.Index(fields=['last_updated'], name='fees_due_updated_idx'),
+            # admin date_hierarchy / ordering on due_date
+            models.Index(fields=['due_date'], name='fees_due_date_idx'),
+            # partial indexes: only unpaid dues are looked up by date
+            models.Index(
+                fields=['student', 'due_date'], condition=models.Q(paid=False),
+                name='fees_due_unpaid_student_idx',
+            ),
+            models.Index(
+                fields=['due_date'], condition=models.Q(paid=False),
+                name='fees_due_unpaid_date_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.paid and self.paid_at is None:
+            self.paid_at = timezone.now()
+        elif not self.paid:
+            self.paid_at = None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.student.name} - {self.due_date} - {self.amount}"
 
 class ActionLog(models.Model):
+    """Audit trail of writes, recorded through fees.audit.audit().
+
+    ``payload`` is the free-text field of entries written before the
+    structured ``data``.
+    """
     action = models.CharField(max_length=100)
+    entity_type = models.CharField(max_length=20, blank=True, default='')
+    entity_id = models.IntegerField(null=True, blank=True)
+    actor = models.CharField(max_length=150, blank=True, default='')
+    data = models.JSONField(null=True, blank=True)
     payload = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['action', 'created_at'], name='fees_log_action_idx'),
+            models.Index(fields=['entity_type', 'entity_id'], name='fees_log_entity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} {self.action} {self.entity_type} {self.entity_id or ''}"
+
+
+class StudentLedger(models.Model):
+    """Denormalised fee summary, one narrow row per student.
+
+    Maintained by fees.ledger.refresh_ledgers() from every code path that
+    writes StudentDue rows; ``manage.py rebuild_ledger`` recomputes it and
+    reports drift. overdue_count is relative to ``as_of``.
+    """
+    student = models.OneToOneField(
+        Student, on_delete=models.CASCADE, primary_key=True, related_name="ledger"
+    )
+    due_count = models.IntegerField(default=0)
+    paid_count = models.IntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    next_due = models.ForeignKey(
+        StudentDue, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    next_due_date = models.DateField(null=True, blank=True)
+    next_due_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    overdue_count = models.IntegerField(default=0)
+    as_of = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # keyset order of the students API (?order=next_due)
+            models.Index(fields=['next_due_date', 'student'], name='fees_ledger_next_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.paid_count}/{self.due_count} paid"
+
+
+class Tombstone(models.Model):
+    """A deleted student or due, kept so the changes feed (fees.sync) can
+    tell offline clients to drop it. A student's tombstone covers its dues."""
+    STUDENT = 'student'
+    DUE = 'due'
+
+    kind = models.CharField(max_length=10, choices=[(STUDENT, 'Student'), (DUE, 'Due')])
+    object_id = models.IntegerField()
+    student_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at}"
+
+
+class ReminderOutbox(models.Model):
+    """A rendered WhatsApp fee reminder, at most one per due.
+
+    Built in bulk by fees.reminders.build_outbox() (``manage.py
+    build_reminders``); student_list links to it by due id. A reminder is
+    ``opened`` once its link has been followed.
+    """
+    PENDING = 'pending'
+    OPENED = 'opened'
+
+    due = models.OneToOneField(StudentDue, on_delete=models.CASCADE, related_name="reminder")
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="reminders")
+    mobile = models.CharField(max_length=20)
+    message = models.TextField()
+    status = models.CharField(
+        max_length=10, choices=[(PENDING, 'Pending'), (OPENED, 'Opened')], default=PENDING
+    )
+    rendered_at = models.DateTimeField(default=timezone.now)
+    opened_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='fees_reminder_status_idx'),
+        ]
+
+    @property
+    def link(self):
+        # put your country code (e.g., 91 for India) in front of the number
+        text = quote_from_bytes(self.message.encode("utf-8"))
+        return f"https://api.whatsapp.com/send?phone=91{self.mobile}&text={text}"
+
+    def __str__(self):
+        return f"Reminder for due {self.due_id} ({self.status})"
+
+
+class CollectionRollup(models.Model):
+    """Fee totals per month, collector and payment method.
+
+    ``expected`` and ``outstanding`` count the dues falling due in
+    ``month`` (unpaid ones under a blank collector and method);
+    ``collected`` counts the dues paid in ``month`` (StudentDue.paid_at).
+    Maintained incrementally by fees.rollup.refresh_rollup().
+    """
+    month = models.DateField()  # first day of the month
+    collected_by = models.CharField(max_length=50, blank=True, default='')
+    payment_method = models.CharField(max_length=20, blank=True, default='')
+    expected_count = models.IntegerField(default=0)
+    expected_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected_count = models.IntegerField(default=0)
+    collected_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding_count = models.IntegerField(default=0)
+    outstanding_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'collected_by', 'payment_method'], name='fees_rollup_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%b %Y} {self.collected_by or '-'} {self.payment_method or '-'}"
+
+
+class CollectionEntry(models.Model):
+    """What one due currently contributes to CollectionRollup.
+
+    Lets a refresh take a due's old figures back out after it changed month,
+    was un-paid or was deleted. Plain ids, not foreign keys: the entry has
+    to outlive its due until the next refresh.
+    """
+    due_id = models.IntegerField(primary_key=True)
+    student_id = models.IntegerField(db_index=True)
+    due_month = models.DateField()
+    paid_month = models.DateField(null=True, blank=True)
+    collected_by = models.CharField(max_length=50, blank=True, default='')
+    payment_method = models.CharField(max_length=20, blank=True, default='')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid = models.BooleanField(default=False)
+
+
+class RollupWatermark(models.Model):
+    """How far a background job has got, one row per job: refresh_rollup()
+    through the dues' last_updated ('collections'), prune_tombstones()
+    through Tombstone.deleted_at ('tombstones')."""
+    name = models.CharField(max_length=20, primary_key=True)
+    upto = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+
+class ArchivedStudent(models.Model):
+    """A student moved out of the hot tables by fees.archive (all dues paid,
+    course over). Keeps the original id so a restore puts it back unchanged."""
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=200)
+    mobile = models.CharField(max_length=20)
+    course = models.CharField(max_length=200)
+    registration_date = models.DateField()
+    joining_date = models.DateField()
+    registration_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    registration_fee_paid = models.BooleanField(default=False)
+    total_due_months = models.IntegerField(default=0)
+    last_updated = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ArchivedDue(models.Model):
+    """A due of an ArchivedStudent, under its original id."""
+    id = models.IntegerField(primary_key=True)
+    student = models.ForeignKey(ArchivedStudent, on_delete=models.CASCADE, related_name="dues")
+    due_date = models.DateField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    last_updated = models.DateTimeField()
+    collected_by = models.CharField(max_length=50, blank=True, null=True)
+    payment_method = models.CharField(max_length=20, blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.student.name} - {self.due_date} - {self.amount}"
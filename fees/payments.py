@@ -0,0 +1,74 @@
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import audit
+from .ledger import refresh_ledgers
+from .models import StudentDue
+
+RULES = ('overdue', 'unpaid')
+
+
+def dues_for_rule(student_ids, rule, today=None):
+    """Unpaid dues of ``student_ids`` selected by ``rule`` ('overdue' or 'unpaid')."""
+    if rule not in RULES:
+        raise ValueError(f"Unknown rule: {rule}")
+    qs = StudentDue.objects.filter(student_id__in=student_ids, paid=False)
+    if rule == 'overdue':
+        qs = qs.filter(due_date__lt=today or date.today())
+    return qs
+
+
+def mark_paid(dues, collected_by, payment_method, actor=''):
+    """Mark every unpaid due in the ``dues`` queryset as paid with one UPDATE.
+
+    Refreshes the affected ledgers, audits one aggregated entry and returns
+    (updated due ids, refreshed StudentLedger rows).
+    """
+    with transaction.atomic():
+        rows = list(dues.filter(paid=False).values_list('id', 'student_id'))
+        due_ids = [due_id for due_id, _ in rows]
+        student_ids = {student_id for _, student_id in rows}
+        if not due_ids:
+            return [], []
+        now = timezone.now()
+        StudentDue.objects.filter(id__in=due_ids, paid=False).update(
+            paid=True,
+            paid_at=now,
+            collected_by=collected_by,
+            payment_method=payment_method,
+            last_updated=now,
+        )
+        ledgers = refresh_ledgers(student_ids)
+        audit(
+            'mark_dues_paid', actor=actor,
+            due_ids=due_ids, student_ids=sorted(student_ids),
+            collected_by=collected_by, payment_method=payment_method,
+        )
+    return due_ids, ledgers
+
+
+def toggle_paid(due, collected_by=None, payment_method=None, actor=''):
+    """Flip one due between paid and unpaid and return its refreshed ledger.
+
+    Marking it paid records who collected it and how; resetting it to unpaid
+    clears both.
+    """
+    with transaction.atomic():
+        if due.paid:
+            due.paid = False
+            due.collected_by = None
+            due.payment_method = None
+        else:
+            due.paid = True
+            due.collected_by = collected_by
+            due.payment_method = payment_method
+        due.save()
+        ledger, = refresh_ledgers([due.student_id])
+        audit(
+            'mark_due_paid' if due.paid else 'mark_due_unpaid', due, actor=actor,
+            student_id=due.student_id, amount=str(due.amount),
+            collected_by=collected_by, payment_method=payment_method,
+        )
+    return ledger
@@ -0,0 +1,166 @@
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from .ledger import ledger_totals
+from .models import Student, StudentDue
+from .search import search_students
+
+# ?status= : where the student's oldest unpaid due (ledger.next_due_date,
+# indexed by fees_ledger_next_due_idx) falls relative to today; 'paid'
+# needs at least one due, like fees.archive
+STATUSES = {
+    'overdue': lambda today: Q(ledger__next_due_date__lt=today),
+    'today': lambda today: Q(ledger__next_due_date=today),
+    'upcoming': lambda today: Q(ledger__next_due_date__gt=today),
+    'paid': lambda today: Q(ledger__due_count__gt=0, ledger__next_due_date__isnull=True),
+}
+SORTS = ('newest', 'oldest_due', 'overdue_amount', 'outstanding')
+
+
+def check_filter_dates(params):
+    """Raise ValueError unless join_from / join_to are empty or YYYY-MM-DD;
+    the ORM would only fail once the query runs."""
+    for name in ('join_from', 'join_to'):
+        value = (params.get(name) or '').strip()
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{name} must be a date (YYYY-MM-DD), got {value!r}")
+
+
+def filter_students(qs, params, today=None):
+    """Apply the student_list filters (join_from / join_to / q / status) to ``qs``."""
+    join_from = (params.get('join_from') or '').strip()
+    join_to = (params.get('join_to') or '').strip()
+    search = (params.get('q') or '').strip()
+    status = (params.get('status') or '').strip()
+
+    if join_from:
+        qs = qs.filter(joining_date__gte=join_from)
+    if join_to:
+        qs = qs.filter(joining_date__lte=join_to)
+    if status in STATUSES:
+        qs = qs.filter(STATUSES[status](today or date.today()))
+    if search:
+        qs = search_students(qs, search)
+    return qs
+
+
+def overdue_amount(today):
+    """Sum of a student's unpaid dues before ``today``, read off the partial
+    unpaid (student, due_date) index."""
+    dues = (
+        StudentDue.objects
+        .filter(student=OuterRef('pk'), paid=False, due_date__lt=today)
+        .order_by()
+        .values('student')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    return Coalesce(Subquery(dues), Value(Decimal('0')))
+
+
+def overdue_count(today):
+    """Number of a student's unpaid dues before ``today``, on the same index.
+    StudentLedger.overdue_count is only right on the ledger's as_of day."""
+    dues = (
+        StudentDue.objects
+        .filter(student=OuterRef('pk'), paid=False, due_date__lt=today)
+        .order_by()
+        .values('student')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(dues), Value(0))
+
+
+def sort_students(qs, sort, today=None):
+    """Order ``qs`` by one of SORTS; unknown values keep newest-first."""
+    if sort == 'oldest_due':
+        return qs.order_by(F('ledger__next_due_date').asc(nulls_last=True), 'id')
+    if sort == 'overdue_amount':
+        return qs.annotate(overdue_amount=overdue_amount(today or date.today())).order_by(
+            '-overdue_amount', F('ledger__next_due_date').asc(nulls_last=True), 'id'
+        )
+    if sort == 'outstanding':
+        return qs.order_by(F('ledger__outstanding_amount').desc(nulls_last=True), '-id')
+    return qs.order_by('-id')
+
+
+def with_fee_totals(qs):
+    """Annotate each student with paid / due figures read from their ledger row."""
+    return qs.annotate(**ledger_totals())
+
+
+def student_queryset(params):
+    today = date.today()
+    qs = with_fee_totals(filter_students(Student.objects.all(), params, today))
+    return sort_students(qs, (params.get('sort') or '').strip(), today)
+
+
+def _group_counts_query(params):
+    return (
+        filter_students(Student.objects.all(), params)
+        .order_by()
+        .values('total_due_months')
+        .annotate(n=Count('id'))
+    )
+
+
+def group_counts(params):
+    """{total_due_months: student count} for the filtered students, in one query."""
+    return {r['total_due_months']: r['n'] for r in _group_counts_query(params)}
+
+
+async def astudent_queryset(params):
+    # built in a thread: search_students may probe the connection for FTS5
+    return await sync_to_async(student_queryset)(params)
+
+
+async def agroup_counts(params):
+    query = await sync_to_async(_group_counts_query)(params)
+    return {r['total_due_months']: r['n'] async for r in query}
+
+
+class CountedPaginator(Paginator):
+    """Paginator whose object count is already known (from group_counts),
+    so paging a group costs one LIMIT/OFFSET query and no COUNT."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for the admin changelists: on PostgreSQL an unfiltered
+    table of ESTIMATE_THRESHOLD rows or more is counted from the planner's
+    estimate (pg_class.reltuples) instead of a COUNT(*) scan. Filtered
+    querysets and other backends get the exact count."""
+    ESTIMATE_THRESHOLD = 100_000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if connection.vendor == 'postgresql' and not qs.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [qs.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
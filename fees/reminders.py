@@ -0,0 +1,137 @@
+"""WhatsApp fee reminders, rendered ahead of time into ReminderOutbox.
+
+build_outbox() picks the students whose oldest unpaid due
+(StudentLedger.next_due, indexed by fees_ledger_next_due_idx) is overdue
+and has no reminder yet, and renders all their messages from
+fees/whatsapp_reminder.txt in one pass. Pending reminders whose due has
+been paid, or whose due or student changed after rendering, are dropped
+first so they are rebuilt. ``manage.py build_reminders`` runs it.
+
+student_list only links to /reminder/<due id>/; reminder_for() renders a
+missing or stale entry on demand when such a link is followed.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import ReminderOutbox, StudentDue, StudentLedger
+
+TEMPLATE = 'fees/whatsapp_reminder.txt'
+
+
+def ordinal(n):
+    """Convert 1 -> 1st, 2 -> 2nd, 3 -> 3rd, etc."""
+    if 10 <= n % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _earlier_dues(due_date, due_id, student):
+    # dues before this one in the schedule order (due_date, id), found on
+    # the (student, due_date) index
+    return StudentDue.objects.filter(
+        Q(due_date__lt=due_date) | Q(due_date=due_date, id__lt=due_id), student=student
+    )
+
+
+def installment_number(due_date, due_id, student):
+    """Subquery for the 1-based position of a due in its student's schedule."""
+    earlier = (
+        _earlier_dues(due_date, due_id, student)
+        .order_by()
+        .values('student')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(earlier), Value(0)) + 1
+
+
+def _render(template, student, due, installment, now):
+    return ReminderOutbox(
+        due=due,
+        student=student,
+        mobile=student.mobile,
+        message=template.render({
+            'name': student.name,
+            'installment': ordinal(installment),
+            'amount': due.amount,
+            'due_date': due.due_date,
+        }).strip(),
+        rendered_at=now,
+    )
+
+
+def drop_stale():
+    """Delete pending reminders that are paid or out of date; returns the count."""
+    stale = ReminderOutbox.objects.filter(status=ReminderOutbox.PENDING).filter(
+        Q(due__paid=True)
+        | Q(due__last_updated__gt=F('rendered_at'))
+        | Q(student__last_updated__gt=F('rendered_at'))
+    )
+    return stale.delete()[0]
+
+
+def outbox_candidates(today=None, ahead=0):
+    """Ledger rows of students whose oldest unpaid due falls before
+    ``today + ahead`` days and has no reminder, with the student and due."""
+    due_before = (today or date.today()) + timedelta(days=ahead)
+    return (
+        StudentLedger.objects
+        .filter(next_due_date__lt=due_before)
+        .filter(~Exists(ReminderOutbox.objects.filter(due=OuterRef('next_due'))))
+        .select_related('student', 'next_due')
+        .annotate(installment=installment_number(
+            OuterRef('next_due_date'), OuterRef('next_due'), OuterRef('student')
+        ))
+        .order_by('next_due_date', 'student')
+    )
+
+
+def build_outbox(today=None, ahead=0, batch_size=500):
+    """Render a reminder for every overdue due without one.
+
+    Returns (stale reminders dropped, reminders created).
+    """
+    template = get_template(TEMPLATE)
+    dropped = drop_stale()
+    created = 0
+    now = timezone.now()
+    batch = []
+    for ledger in outbox_candidates(today, ahead).iterator(chunk_size=batch_size):
+        batch.append(_render(template, ledger.student, ledger.next_due, ledger.installment, now))
+        if len(batch) >= batch_size:
+            created += _save(batch)
+            batch = []
+    created += _save(batch)
+    return dropped, created
+
+
+def _save(batch):
+    # ignore_conflicts: a reminder_for() click may have rendered one meanwhile
+    ReminderOutbox.objects.bulk_create(batch, ignore_conflicts=True)
+    return len(batch)
+
+
+def reminder_for(due):
+    """The up-to-date reminder of the unpaid ``due`` (with its student
+    loaded), rendering it if the outbox has none."""
+    student = due.student
+    reminder = ReminderOutbox.objects.filter(due=due).first()
+    if reminder and reminder.rendered_at >= max(due.last_updated, student.last_updated):
+        return reminder
+    installment = _earlier_dues(due.due_date, due.id, student).count() + 1
+    fresh = _render(get_template(TEMPLATE), student, due, installment, timezone.now())
+    with transaction.atomic():
+        if reminder:
+            fresh.pk, fresh.status, fresh.opened_at = reminder.pk, reminder.status, reminder.opened_at
+            fresh.save()
+        else:
+            ReminderOutbox.objects.bulk_create([fresh], ignore_conflicts=True)
+            fresh = ReminderOutbox.objects.get(due=due)
+    return fresh
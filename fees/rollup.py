@@ -0,0 +1,267 @@
+"""Monthly collections rollup behind the collections report.
+
+CollectionRollup holds expected / collected / outstanding totals per
+(month, collector, payment method). refresh_rollup() keeps it current
+without re-aggregating the dues table:
+
+- dues whose last_updated is at or after the watermark are re-read on
+  fees_due_updated_idx, and each one's change against its CollectionEntry
+  (what it contributed last time) is added to the rollup
+- dues deleted since the watermark (Tombstone, on its deleted_at index)
+  have their entries subtracted and removed; archived dues (fees.archive)
+  are still counted
+
+Applying a due whose entry is already current changes nothing, so the
+watermark is moved back by FEES_SYNC_SETTLE_SECONDS to pick up rows whose
+transaction committed after they were stamped. ``manage.py
+refresh_collections`` runs it (``--check`` compares against a full
+recount). The report only reads the rollup, a few rows per month.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedDue, CollectionEntry, CollectionRollup, RollupWatermark, StudentDue, Tombstone,
+)
+
+WATERMARK = 'collections'
+MEASURES = (
+    'expected_count', 'expected_amount', 'collected_count', 'collected_amount',
+    'outstanding_count', 'outstanding_amount',
+)
+DUE_FIELDS = ('id', 'student_id', 'due_date', 'paid', 'paid_at', 'collected_by', 'payment_method', 'amount')
+# outstanding amounts by how many months ago they fell due
+AGING = ('Due this month', '1 month overdue', '2 months overdue', '3+ months overdue')
+
+
+def month_of(value):
+    return value.replace(day=1) if value else None
+
+
+def entry_for(due):
+    """The CollectionEntry of a due given as a values() dict."""
+    paid = due['paid']
+    return CollectionEntry(
+        due_id=due['id'],
+        student_id=due['student_id'],
+        due_month=month_of(due['due_date']),
+        paid_month=month_of(due['paid_at'].date()) if paid and due['paid_at'] else None,
+        collected_by=(due['collected_by'] or '') if paid else '',
+        payment_method=(due['payment_method'] or '') if paid else '',
+        amount=due['amount'],
+        paid=paid,
+    )
+
+
+def contributions(entry):
+    """(rollup key, measure, value) triples that ``entry`` adds to the rollup."""
+    key = (entry.due_month, entry.collected_by, entry.payment_method)
+    yield key, 'expected_count', 1
+    yield key, 'expected_amount', entry.amount
+    if entry.paid:
+        if entry.paid_month:
+            paid_key = (entry.paid_month, entry.collected_by, entry.payment_method)
+            yield paid_key, 'collected_count', 1
+            yield paid_key, 'collected_amount', entry.amount
+    else:
+        yield key, 'outstanding_count', 1
+        yield key, 'outstanding_amount', entry.amount
+
+
+def _add(totals, entry, sign):
+    for key, measure, value in contributions(entry):
+        totals[key][measure] += sign * value
+
+
+def _new_totals():
+    return defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+
+
+def _apply(deltas):
+    """Add ``deltas`` {key: {measure: change}} to the stored rollup rows."""
+    deltas = {k: d for k, d in deltas.items() if any(d.values())}
+    if not deltas:
+        return
+    stored = {
+        (r.month, r.collected_by, r.payment_method): r
+        for r in CollectionRollup.objects.filter(month__in={k[0] for k in deltas})
+    }
+    rows = []
+    for key, delta in deltas.items():
+        row = stored.get(key) or CollectionRollup(
+            month=key[0], collected_by=key[1], payment_method=key[2]
+        )
+        for measure, change in delta.items():
+            setattr(row, measure, getattr(row, measure) + change)
+        rows.append(row)
+    CollectionRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['month', 'collected_by', 'payment_method'],
+        update_fields=list(MEASURES),
+    )
+
+
+def _refresh_dues(model, due_ids, deltas, batch_size):
+    for start in range(0, len(due_ids), batch_size):
+        chunk = due_ids[start:start + batch_size]
+        old = CollectionEntry.objects.in_bulk(chunk)
+        new = []
+        for due in model.objects.filter(id__in=chunk).values(*DUE_FIELDS):
+            entry = entry_for(due)
+            previous = old.get(entry.due_id)
+            if previous is not None:
+                _add(deltas, previous, -1)
+            _add(deltas, entry, 1)
+            new.append(entry)
+        CollectionEntry.objects.bulk_create(
+            new,
+            update_conflicts=True,
+            unique_fields=['due_id'],
+            update_fields=[f.name for f in CollectionEntry._meta.fields if not f.primary_key],
+        )
+
+
+def _drop_deleted(since, deltas):
+    if since is None:
+        return 0  # first build: no entries yet
+    tombstones = Tombstone.objects.filter(deleted_at__gte=since)
+    due_ids, student_ids = set(), set()
+    for kind, object_id, student_id in tombstones.values_list('kind', 'object_id', 'student_id'):
+        (student_ids if kind == Tombstone.STUDENT else due_ids).add(object_id)
+    if not due_ids and not student_ids:
+        return 0
+    entries = CollectionEntry.objects.filter(Q(due_id__in=due_ids) | Q(student_id__in=student_ids))
+    # keep the entries of dues that still exist, in the hot or archive table
+    existing = set()
+    for model in (StudentDue, ArchivedDue):
+        existing.update(model.objects.filter(
+            id__in=entries.values('due_id')
+        ).values_list('id', flat=True))
+    gone = [e for e in entries if e.due_id not in existing]
+    for entry in gone:
+        _add(deltas, entry, -1)
+    CollectionEntry.objects.filter(due_id__in=[e.due_id for e in gone]).delete()
+    return len(gone)
+
+
+def refresh_rollup(now=None, batch_size=2000):
+    """Bring CollectionRollup up to date with the dues changed or deleted
+    since the last refresh (all dues on the first run).
+
+    Returns (dues re-read, deleted dues removed).
+    """
+    now = now or timezone.now()
+    settle = timedelta(seconds=getattr(settings, 'FEES_SYNC_SETTLE_SECONDS', 2))
+    with transaction.atomic():
+        # write first: takes the database write lock (SQLite) / row lock so
+        # two refreshes never apply the same change twice
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        RollupWatermark.objects.filter(name=WATERMARK).update(refreshed_at=now)
+        since = RollupWatermark.objects.get(name=WATERMARK).upto
+
+        changed = StudentDue.objects.all()
+        if since is not None:
+            changed = changed.filter(last_updated__gte=since)
+        due_ids = list(changed.values_list('id', flat=True))
+
+        deltas = _new_totals()
+        _refresh_dues(StudentDue, due_ids, deltas, batch_size)
+        if since is None:
+            # archived dues never change, so only the first build reads them
+            archived_ids = list(ArchivedDue.objects.values_list('id', flat=True))
+            _refresh_dues(ArchivedDue, archived_ids, deltas, batch_size)
+        removed = _drop_deleted(since, deltas)
+        _apply(deltas)
+        RollupWatermark.objects.filter(name=WATERMARK).update(upto=now - settle)
+    return len(due_ids), removed
+
+
+def rebuild_rollup(batch_size=2000):
+    """Drop the rollup and its entries and build them again from all dues."""
+    with transaction.atomic():
+        CollectionRollup.objects.all().delete()
+        CollectionEntry.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK).delete()
+        return refresh_rollup(batch_size=batch_size)
+
+
+def find_drift():
+    """Rollup values that disagree with a full recount of the dues, archived
+    ones included, as (key, measure, stored, actual)."""
+    actual = _new_totals()
+    for model in (StudentDue, ArchivedDue):
+        for due in model.objects.values(*DUE_FIELDS).iterator(chunk_size=5000):
+            _add(actual, entry_for(due), 1)
+    stored = {
+        (r.month, r.collected_by, r.payment_method): r for r in CollectionRollup.objects.all()
+    }
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        row = stored.get(key)
+        for measure in MEASURES:
+            have = getattr(row, measure) if row else 0
+            want = actual[key][measure] if key in actual else 0
+            if have != want:
+                drift.append((key, measure, have, want))
+    return drift
+
+
+def _months_between(later, earlier):
+    return (later.year - earlier.year) * 12 + later.month - earlier.month
+
+
+def collections_report(year, today=None):
+    """Figures for the collections page: per-month expected / collected /
+    outstanding for ``year`` (up to the current month), collected totals by
+    collector and by method, and outstanding amounts by age."""
+    today = today or date.today()
+    last_month = date(year, 12, 1) if year < today.year else month_of(today)
+    rows = list(CollectionRollup.objects.filter(month__gte=date(year, 1, 1), month__lte=last_month))
+
+    zero = Decimal('0')
+    months = {}
+    by_collector = defaultdict(lambda: [0, zero])
+    by_method = defaultdict(lambda: [0, zero])
+    for r in rows:
+        m = months.setdefault(r.month, {'month': r.month, 'expected': zero, 'collected': zero, 'outstanding': zero})
+        m['expected'] += r.expected_amount
+        m['collected'] += r.collected_amount
+        m['outstanding'] += r.outstanding_amount
+        if r.collected_count:
+            by_collector[r.collected_by][0] += r.collected_count
+            by_collector[r.collected_by][1] += r.collected_amount
+            by_method[r.payment_method][0] += r.collected_count
+            by_method[r.payment_method][1] += r.collected_amount
+    months = [months[k] for k in sorted(months)]
+    for m in months:
+        m['rate'] = round(100 * (m['expected'] - m['outstanding']) / m['expected']) if m['expected'] else None
+
+    # aging covers every month with outstanding dues, not just this year
+    aging = [{'label': label, 'count': 0, 'amount': zero} for label in AGING]
+    for r in CollectionRollup.objects.filter(outstanding_count__gt=0, month__lte=month_of(today)):
+        bucket = aging[min(max(_months_between(today, r.month), 0), len(AGING) - 1)]
+        bucket['count'] += r.outstanding_count
+        bucket['amount'] += r.outstanding_amount
+
+    def ranked(totals):
+        return sorted(
+            ({'name': name, 'count': n, 'amount': amount} for name, (n, amount) in totals.items()),
+            key=lambda t: -t['amount'],
+        )
+
+    return {
+        'months': months,
+        'by_collector': ranked(by_collector),
+        'by_method': ranked(by_method),
+        'aging': aging,
+        'expected': sum((m['expected'] for m in months), zero),
+        'collected': sum((m['collected'] for m in months), zero),
+        'outstanding': sum((m['outstanding'] for m in months), zero),
+    }
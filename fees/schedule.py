@@ -0,0 +1,130 @@
+"""Monthly installment schedules: generation from a joining date and
+syncing a posted schedule (due_date_<i> / due_amount_<i> fields) onto the
+stored StudentDue rows with bulk writes."""
+import calendar
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .ledger import refresh_ledgers
+from .models import StudentDue, Tombstone
+from .sync import record_deletions
+
+
+def add_months(base_date, months):
+    y = base_date.year + (base_date.month - 1 + months) // 12
+    m = (base_date.month - 1 + months) % 12 + 1
+    d = min(base_date.day, calendar.monthrange(y, m)[1])
+    return date(y, m, d)
+
+
+def generate_schedule(start_date, months, offset=0):
+    """Due dates for installments ``offset`` .. ``months - 1`` starting at ``start_date``."""
+    return [add_months(start_date, i) for i in range(offset, months)]
+
+
+def parse_due_date(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        y, m, d = map(int, value.split('-'))
+        return date(y, m, d)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_amount(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def requested_months(post_data, default):
+    try:
+        return int(post_data.get('total_due_months', default) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_dues(student, post_data, start, stop):
+    """Unsaved StudentDue rows for installments ``start`` .. ``stop - 1``,
+    taking posted dates/amounts where given and the generated schedule otherwise."""
+    dues = []
+    for i, generated in enumerate(generate_schedule(student.joining_date, stop, start), start):
+        dues.append(StudentDue(
+            student=student,
+            due_date=parse_due_date(post_data.get(f'due_date_{i}')) or generated,
+            amount=parse_amount(post_data.get(f'due_amount_{i}')) or Decimal('0'),
+            paid=False,
+        ))
+    return dues
+
+
+def sync_dues(student, post_data):
+    """Bring the stored dues in line with the posted schedule:
+
+    - paid months are never changed
+    - when the total decreases, unpaid months are removed from the end
+    - when it increases, new months are added from the posted fields or the
+      generated schedule
+    - unpaid months take their posted date/amount, and are only written when
+      something actually changed
+
+    The diff is applied in one transaction with a single delete (plus its
+    tombstones for the changes feed), one bulk_update of the dirty fields
+    and one bulk_create.
+    """
+    dues = list(student.dues.order_by('due_date', 'id'))
+    requested = requested_months(post_data, student.total_due_months)
+
+    to_delete = []
+    excess = len(dues) - requested
+    for d in reversed(dues):
+        if len(to_delete) >= excess:
+            break
+        if not d.paid:
+            to_delete.append(d.id)
+    deleted_ids = set(to_delete)
+    kept = [d for d in dues if d.id not in deleted_ids]
+
+    now = timezone.now()
+    dirty, dirty_fields = [], set()
+    for i, d in enumerate(kept[:requested]):
+        if d.paid:
+            continue
+        changed = False
+        due_dt = parse_due_date(post_data.get(f'due_date_{i}'))
+        if due_dt and due_dt != d.due_date:
+            d.due_date = due_dt
+            dirty_fields.add('due_date')
+            changed = True
+        amt = parse_amount(post_data.get(f'due_amount_{i}'))
+        if amt is not None and amt != d.amount:
+            d.amount = amt
+            dirty_fields.add('amount')
+            changed = True
+        if changed:
+            # bulk_update skips auto_now, so stamp it ourselves
+            d.last_updated = now
+            dirty.append(d)
+
+    new = build_dues(student, post_data, len(kept), requested)
+
+    with transaction.atomic():
+        if to_delete:
+            StudentDue.objects.filter(id__in=to_delete).delete()
+            record_deletions(Tombstone.DUE, [(due_id, student.id) for due_id in to_delete])
+        if dirty:
+            StudentDue.objects.bulk_update(dirty, sorted(dirty_fields) + ['last_updated'])
+        if new:
+            StudentDue.objects.bulk_create(new)
+        refresh_ledgers([student.id])
+
+    return {'deleted': to_delete, 'updated': dirty, 'created': new}
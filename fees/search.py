@@ -0,0 +1,151 @@
+"""Indexed student search for the ``q`` box.
+
+SQLite: an FTS5 table (fees_student_fts) keyed by student id, holding the
+name plus the normalised mobile number forwards and reversed, so both
+prefix and suffix matches are index lookups. It is kept in sync from
+Student saves/deletes (fees.signals) and can be rebuilt with
+``manage.py rebuild_search_index``.
+
+PostgreSQL: pg_trgm GIN indexes on UPPER(name) and mobile make the
+icontains/contains lookups index scans, so no side table is needed.
+
+Any other backend falls back to the original icontains filter.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'fees_student_fts'
+
+_MOBILE_RE = re.compile(r'[\d\s()+-]+')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, mobile, mobile_rev, tokenize='unicode61', prefix='2 3')"
+)
+FTS_DROP_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+PG_CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS fees_student_name_trgm "
+    "ON fees_student USING gin (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS fees_student_mobile_trgm "
+    "ON fees_student USING gin (mobile gin_trgm_ops)",
+]
+PG_DROP_SQL = [
+    "DROP INDEX IF EXISTS fees_student_name_trgm",
+    "DROP INDEX IF EXISTS fees_student_mobile_trgm",
+]
+
+
+def normalize_mobile(value):
+    """Digits only, without a leading 91 / 0 trunk prefix on 10-digit numbers."""
+    digits = re.sub(r'\D', '', value or '')
+    if len(digits) == 12 and digits.startswith('91'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    return digits
+
+
+def fts_available(conn=None):
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    cached = getattr(conn, '_fees_fts_available', None)
+    if cached is None:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            cached = conn._fees_fts_available = cursor.fetchone() is not None
+    return cached
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def fts_query(term):
+    """Translate the search box text into an FTS5 MATCH expression."""
+    term = term.strip()
+    if _MOBILE_RE.fullmatch(term) and re.search(r'\d', term):
+        digits = normalize_mobile(term)
+        return (
+            f"(mobile : {_quote(digits)}* OR mobile_rev : {_quote(digits[::-1])}*)"
+        )
+    words = _WORD_RE.findall(term)
+    return ' AND '.join(f"name : {_quote(w)}*" for w in words)
+
+
+def search_students(qs, term):
+    term = (term or '').strip()
+    if not term:
+        return qs
+    if fts_available():
+        match = fts_query(term)
+        if not match:
+            return qs.none()
+        return qs.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+    if connection.vendor == 'postgresql':
+        digits = normalize_mobile(term) if _MOBILE_RE.fullmatch(term) else ''
+        cond = Q(name__icontains=term)
+        if digits:
+            cond |= Q(mobile__contains=digits)
+        return qs.filter(cond)
+    return qs.filter(Q(name__icontains=term) | Q(mobile__icontains=term))
+
+
+def index_students(students):
+    """(Re)write the FTS rows for ``students``; a no-op without FTS5."""
+    if not students or not fts_available():
+        return
+    rows = []
+    for s in students:
+        mobile = normalize_mobile(s.mobile)
+        rows.append((s.id, s.name, mobile, mobile[::-1]))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, mobile, mobile_rev) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_students(student_ids):
+    if not student_ids or not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(i,) for i in student_ids]
+        )
+
+
+def create_search_index(schema_editor):
+    conn = schema_editor.connection
+    conn._fees_fts_available = None
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if 'ENABLE_FTS5' not in {r[0] for r in cursor.fetchall()}:
+                return False
+        schema_editor.execute(FTS_CREATE_SQL)
+        return True
+    if conn.vendor == 'postgresql':
+        for sql in PG_CREATE_SQL:
+            schema_editor.execute(sql)
+    return False
+
+
+def drop_search_index(schema_editor):
+    conn = schema_editor.connection
+    conn._fees_fts_available = None
+    if conn.vendor == 'sqlite':
+        schema_editor.execute(FTS_DROP_SQL)
+    elif conn.vendor == 'postgresql':
+        for sql in PG_DROP_SQL:
+            schema_editor.execute(sql)
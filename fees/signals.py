@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Student, Tombstone
+from .search import index_students, unindex_students
+from .sync import record_deletions
+
+
+@receiver(post_save, sender=Student)
+def student_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_students([instance])
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted(sender, instance, **kwargs):
+    unindex_students([instance.pk])
+    record_deletions(Tombstone.STUDENT, [(instance.pk, instance.pk)])
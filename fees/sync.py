@@ -0,0 +1,175 @@
+"""Changes feed for offline clients (GET /api/changes/).
+
+A client keeps a local copy of the students and dues and asks for what
+changed since its last watermark: rows whose last_updated moved (new or
+modified) and tombstones for deleted ones. Each stream is read in
+(timestamp, id) order on its last_updated / deleted_at index, so the
+watermark is an exact keyset position per stream and only ever moves
+forward; a large backlog comes back in pages (``more``).
+
+Rows stamped within the last FEES_SYNC_SETTLE_SECONDS are held back to the
+next poll: timestamps are taken before the write commits, and without the
+delay a client could move past a row whose transaction had not committed yet.
+
+Deletes are recorded explicitly with record_deletions() (student_delete via
+the Student post_delete handler, sync_dues, the admin), like the ledger
+refreshes, so queryset deletes of dues stay single statements.
+
+Tombstones are kept FEES_TOMBSTONE_RETENTION_DAYS (``manage.py
+prune_tombstones``). A client whose watermark is older than the newest
+pruned tombstone may have missed deletes: changes() raises StaleWatermark
+and the API answers 410 so it starts again from an empty watermark.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import rollup
+from .models import RollupWatermark, Student, StudentDue, Tombstone
+
+STUDENT_FIELDS = (
+    'id', 'name', 'mobile', 'course', 'registration_date', 'joining_date',
+    'registration_fee', 'registration_fee_paid', 'total_due_months', 'last_updated',
+)
+DUE_FIELDS = (
+    'id', 'student_id', 'due_date', 'amount', 'paid', 'collected_by',
+    'payment_method', 'last_updated',
+)
+
+# stream name -> (queryset, timestamp field, fields)
+STREAMS = {
+    'students': (Student.objects.all(), 'last_updated', STUDENT_FIELDS),
+    'dues': (StudentDue.objects.all(), 'last_updated', DUE_FIELDS),
+    'deleted': (Tombstone.objects.all(), 'deleted_at', ('id', 'kind', 'object_id', 'student_id', 'deleted_at')),
+}
+
+
+# RollupWatermark row holding the deleted_at of the newest pruned tombstone
+PRUNED = 'tombstones'
+
+
+class WatermarkError(ValueError):
+    pass
+
+
+class StaleWatermark(WatermarkError):
+    """Tombstones past the watermark have been pruned; sync from scratch."""
+
+
+def record_deletions(kind, rows, deleted_at=None):
+    """Write tombstones for ``rows``, (object id, student id) pairs of ``kind``."""
+    deleted_at = deleted_at or timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=object_id, student_id=student_id, deleted_at=deleted_at)
+        for object_id, student_id in rows
+    ])
+
+
+def encode_watermark(positions):
+    raw = json.dumps({
+        name: [stamp.isoformat(), pk] for name, (stamp, pk) in positions.items() if stamp
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_watermark(token):
+    if not token:
+        return {}
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return {
+            name: (datetime.fromisoformat(stamp), int(pk))
+            for name, (stamp, pk) in raw.items() if name in STREAMS
+        }
+    except (ValueError, TypeError, AttributeError):
+        raise WatermarkError("Invalid watermark")
+
+
+def stream_queryset(name, after, upto):
+    """Rows of stream ``name`` past the (timestamp, id) position ``after``,
+    stamped no later than ``upto``, in feed order."""
+    qs, stamp, fields = STREAMS[name]
+    qs = qs.filter(**{f'{stamp}__lte': upto})
+    if after:
+        at, pk = after
+        qs = qs.filter(**{f'{stamp}__gte': at}).filter(
+            Q(**{f'{stamp}__gt': at}) | Q(id__gt=pk)
+        )
+    return qs.order_by(stamp, 'id').values(*fields)
+
+
+def prunable_tombstones(before):
+    """Tombstones written before ``before`` that the collections rollup has
+    already read (it drops deleted dues from the tombstones after its
+    watermark)."""
+    rollup_upto = (
+        RollupWatermark.objects.filter(name=rollup.WATERMARK).values_list('upto', flat=True).first()
+    )
+    if rollup_upto is not None:
+        before = min(before, rollup_upto)
+    return Tombstone.objects.filter(deleted_at__lt=before)
+
+
+def prune_tombstones(before, chunk_size=5000, on_chunk=None):
+    """Delete prunable_tombstones(before), oldest first, one committed chunk
+    at a time, and record the newest deleted_at pruned for changes().
+    Returns the number removed."""
+    old = prunable_tombstones(before)
+
+    removed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.order_by('deleted_at', 'id').values_list('id', 'deleted_at')[:chunk_size])
+            if not rows:
+                break
+            Tombstone.objects.filter(id__in=[pk for pk, _ in rows]).delete()
+            RollupWatermark.objects.update_or_create(
+                name=PRUNED, defaults={'upto': rows[-1][1], 'refreshed_at': timezone.now()},
+            )
+        removed += len(rows)
+        if on_chunk:
+            on_chunk(removed)
+    return removed
+
+
+def check_not_pruned(positions):
+    """Raise StaleWatermark if tombstones the client has not seen were pruned."""
+    if not positions:
+        return  # a first sync reads everything there is
+    pruned = RollupWatermark.objects.filter(name=PRUNED).values_list('upto', flat=True).first()
+    seen = positions.get('deleted')
+    if pruned is not None and (seen is None or seen[0] <= pruned):
+        raise StaleWatermark("Deletions after this watermark have been pruned; sync again from scratch")
+
+
+def changes(token=None, limit=500, now=None):
+    """Upserts and deletions since the watermark ``token``, at most
+    ``limit`` per stream, with the watermark to send next time."""
+    positions = decode_watermark(token)
+    check_not_pruned(positions)
+    settle = getattr(settings, 'FEES_SYNC_SETTLE_SECONDS', 2)
+    upto = (now or timezone.now()) - timedelta(seconds=settle)
+
+    result, more = {}, False
+    for name, (_, stamp, _) in STREAMS.items():
+        # one row past the limit tells whether the stream has more
+        rows = list(stream_queryset(name, positions.get(name), upto)[:limit + 1])
+        if len(rows) > limit:
+            rows, more = rows[:limit], True
+            positions[name] = (rows[-1][stamp], rows[-1]['id'])
+        elif rows and rows[-1][stamp] == upto:
+            positions[name] = (rows[-1][stamp], rows[-1]['id'])
+        else:
+            # read to the end: nothing else is stamped up to ``upto``, so the
+            # position moves there and a quiet stream (no deletes for weeks)
+            # does not fall behind the tombstone retention
+            positions[name] = (upto, 0)
+        result[name] = rows
+    result['watermark'] = encode_watermark(positions)
+    result['more'] = more
+    return result
@@ -0,0 +1,567 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import async_views, rollup, views
+from .admin import StudentDueAdmin, StudentDueInline
+from .archive import archive_candidates, archive_students, restore_student
+from .db import retry_on_db_lock, sqlite_pragmas
+from .ledger import find_drift, refresh_ledgers
+from .management.commands.check_query_plans import PG_FULL_SCAN, SQLITE_FULL_SCAN, hot_queries
+from .models import ActionLog, ArchivedDue, ArchivedStudent, Student, StudentDue, StudentLedger, Tombstone
+from .payments import dues_for_rule, mark_paid, toggle_paid
+from .queries import filter_students
+from .search import search_students
+from .sync import StaleWatermark, changes, prune_tombstones, record_deletions
+from .schedule import generate_schedule, sync_dues
+
+
+def make_student(months=3, paid=0, joining_date=date(2025, 1, 10), amount=Decimal('1500.00'), **fields):
+    """A student with ``months`` dues, the first ``paid`` of them paid, and
+    its ledger; the way student_add leaves one."""
+    fields = {
+        'name': 'Student', 'mobile': '9876500000', 'course': 'Python',
+        'registration_date': joining_date, 'registration_fee': Decimal('500.00'),
+        'registration_fee_paid': True, **fields,
+    }
+    student = Student.objects.create(joining_date=joining_date, total_due_months=months, **fields)
+    StudentDue.objects.bulk_create([
+        StudentDue(
+            student=student, due_date=due_date, amount=amount, paid=i < paid,
+            paid_at=datetime.combine(due_date, datetime.min.time()) if i < paid else None,
+            collected_by='Sridhar' if i < paid else None,
+            payment_method='Cash' if i < paid else None,
+        )
+        for i, due_date in enumerate(generate_schedule(joining_date, months))
+    ])
+    refresh_ledgers([student.id])
+    return student
+
+
+class RetryOnDbLockTests(TransactionTestCase):
+    # not TestCase: its per-test transaction would (rightly) disable retries
+    def setUp(self):
+        self.request = RequestFactory().post('/')
+        self.calls = 0
+
+    def flaky_view(self, failures, message='database is locked'):
+        @retry_on_db_lock(attempts=3, backoff=0)
+        def view(request):
+            self.calls += 1
+            if self.calls <= failures:
+                raise OperationalError(message)
+            return HttpResponse('ok')
+        return view
+
+    def test_retries_until_the_lock_is_released(self):
+        response = self.flaky_view(failures=2)(self.request)
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(self.calls, 3)
+
+    def test_gives_up_after_the_last_attempt(self):
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            self.flaky_view(failures=3)(self.request)
+        self.assertEqual(self.calls, 3)
+
+    def test_other_errors_are_not_retried(self):
+        with self.assertRaisesMessage(OperationalError, 'no such table'):
+            self.flaky_view(failures=1, message='no such table: fees_student')(self.request)
+        self.assertEqual(self.calls, 1)
+
+    def test_not_retried_inside_a_transaction(self):
+        # the caller's transaction is already broken; re-running would not help
+        with transaction.atomic():
+            with self.assertRaises(OperationalError):
+                self.flaky_view(failures=1)(self.request)
+        self.assertEqual(self.calls, 1)
+
+    def test_busy_timeout_follows_the_database_timeout(self):
+        settings_dict = {'OPTIONS': {'timeout': 20}}
+        self.assertEqual(sqlite_pragmas(settings_dict)['busy_timeout'], 20000)
+        if connection.vendor == 'sqlite':
+            timeout = connection.settings_dict.get('OPTIONS', {}).get('timeout', 5)
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA busy_timeout")
+                self.assertEqual(cursor.fetchone()[0], int(timeout * 1000))
+
+
+class QueryPlanTests(TestCase):
+    """The hot queries of manage.py check_query_plans must stay on indexes."""
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor == 'postgresql':
+            pattern = PG_FULL_SCAN
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        elif connection.vendor == 'sqlite':
+            pattern = SQLITE_FULL_SCAN
+        else:
+            self.skipTest(f"no plan check for {connection.vendor}")
+        for label, qs in hot_queries():
+            with self.subTest(label):
+                plan = qs.explain()
+                self.assertEqual(pattern.findall(plan), [], f"full table scan in:\n{plan}")
+
+
+class RollupTests(TestCase):
+    """refresh_rollup() keeps the collections rollup equal to a full recount."""
+
+    def setUp(self):
+        self.student = make_student(months=4, paid=2)
+        self.finished = make_student(months=3, paid=3, name='Finished')
+        rollup.refresh_rollup()
+
+    def assertNoDrift(self):
+        rollup.refresh_rollup()
+        self.assertEqual(rollup.find_drift(), [])
+
+    def test_first_build(self):
+        self.assertEqual(rollup.find_drift(), [])
+
+    def test_toggle(self):
+        paid, unpaid = self.student.dues.order_by('due_date')[1:3]
+        toggle_paid(paid)
+        toggle_paid(unpaid, collected_by='Binduja', payment_method='GPay')
+        self.assertNoDrift()
+
+    def test_due_delete(self):
+        due = self.student.dues.order_by('due_date').last()
+        StudentDueAdmin(StudentDue, admin.site).delete_model(None, due)
+        self.assertNoDrift()
+
+    def test_archive_and_restore(self):
+        archive_students([self.finished.id])
+        self.assertNoDrift()
+        restore_student(self.finished.id)
+        self.assertNoDrift()
+
+
+class ArchiveTests(TestCase):
+    cutoff = date(2026, 1, 1)
+
+    def test_candidates(self):
+        finished = make_student(months=3, paid=3)
+        make_student(months=3, paid=2)
+        make_student(months=0)
+        make_student(months=3, paid=3, joining_date=date(2025, 11, 10))
+        self.assertEqual(list(archive_candidates(self.cutoff)), [finished])
+
+    def test_stale_ledger_is_not_trusted(self):
+        student = make_student(months=3, paid=2)
+        StudentLedger.objects.filter(student=student).update(next_due=None, next_due_date=None)
+        self.assertEqual(list(archive_candidates(self.cutoff)), [])
+
+    def test_archive_and_restore(self):
+        student = make_student(months=3, paid=3)
+        due_ids = sorted(student.dues.values_list('id', flat=True))
+        dues = list(StudentDue.objects.filter(student=student).order_by('id').values(
+            'id', 'due_date', 'amount', 'paid', 'paid_at', 'collected_by', 'payment_method',
+        ))
+
+        self.assertEqual(archive_students([student.id]), [student.id])
+        self.assertFalse(Student.objects.filter(pk=student.id).exists())
+        self.assertFalse(StudentDue.objects.filter(id__in=due_ids).exists())
+        self.assertFalse(StudentLedger.objects.filter(student_id=student.id).exists())
+        archived = ArchivedStudent.objects.get(pk=student.id)
+        self.assertEqual(archived.name, student.name)
+        self.assertEqual(sorted(archived.dues.values_list('id', flat=True)), due_ids)
+        self.assertTrue(
+            Tombstone.objects.filter(kind=Tombstone.STUDENT, object_id=student.id).exists()
+        )
+
+        restored = restore_student(student.id)
+        self.assertEqual(restored.id, student.id)
+        self.assertFalse(ArchivedStudent.objects.filter(pk=student.id).exists())
+        self.assertFalse(ArchivedDue.objects.filter(id__in=due_ids).exists())
+        self.assertEqual(list(StudentDue.objects.filter(student=restored).order_by('id').values(
+            'id', 'due_date', 'amount', 'paid', 'paid_at', 'collected_by', 'payment_method',
+        )), dues)
+        self.assertFalse(Tombstone.objects.filter(student_id=student.id).exists())
+        self.assertEqual(restored.ledger.paid_count, 3)
+        self.assertEqual(find_drift([student.id]), [])
+
+
+class SyncDuesTests(TestCase):
+    def setUp(self):
+        self.student = make_student(months=5)
+
+    def dues(self):
+        return list(self.student.dues.order_by('due_date', 'id'))
+
+    def test_decrease_keeps_paid_tail_months(self):
+        dues = self.dues()
+        for due in dues[3:]:
+            toggle_paid(due, collected_by='Sridhar', payment_method='Cash')
+        result = sync_dues(self.student, {'total_due_months': '3'})
+        self.assertEqual(sorted(result['deleted']), [dues[1].id, dues[2].id])
+        self.assertEqual([d.id for d in self.dues()], [dues[0].id, dues[3].id, dues[4].id])
+        self.assertEqual(
+            set(Tombstone.objects.filter(kind=Tombstone.DUE).values_list('object_id', flat=True)),
+            {dues[1].id, dues[2].id},
+        )
+        self.assertEqual(find_drift([self.student.id]), [])
+
+    def test_increase(self):
+        result = sync_dues(self.student, {
+            'total_due_months': '7', 'due_date_5': '2025-07-01', 'due_amount_5': '900',
+        })
+        self.assertEqual(len(result['created']), 2)
+        new = self.dues()[5:]
+        self.assertEqual([(d.due_date, d.amount) for d in new], [
+            (date(2025, 7, 1), Decimal('900')), (date(2025, 7, 10), Decimal('0')),
+        ])
+        self.assertEqual(self.student.ledger.due_count, 7)
+        self.assertEqual(find_drift([self.student.id]), [])
+
+    def test_amount_only_change(self):
+        before = self.dues()
+        post = {'total_due_months': '5'}
+        for i, due in enumerate(before):
+            post[f'due_date_{i}'] = due.due_date.isoformat()
+            post[f'due_amount_{i}'] = str(due.amount)
+        post['due_amount_2'] = '1750.00'
+        result = sync_dues(self.student, post)
+        self.assertEqual([d.id for d in result['updated']], [before[2].id])
+        after = self.dues()
+        self.assertEqual(after[2].amount, Decimal('1750.00'))
+        self.assertEqual(after[2].due_date, before[2].due_date)
+        self.assertGreater(after[2].last_updated, before[2].last_updated)
+        for old, new in zip(before[:2] + before[3:], after[:2] + after[3:]):
+            self.assertEqual((new.amount, new.last_updated), (old.amount, old.last_updated))
+        self.assertEqual(find_drift([self.student.id]), [])
+
+    def test_query_count_does_not_grow_with_the_schedule(self):
+        # read; the delete (its cascade collector, outbox and ledger
+        # SET_NULL) and tombstones; bulk_update; ledger read + upsert; the
+        # savepoint pair. However many months are touched.
+        for months in (6, 36):
+            student = make_student(months=months, paid=2)
+            post = {'total_due_months': str(months - 3)}
+            post.update({f'due_amount_{i}': '1' for i in range(2, months - 3)})
+            with self.assertNumQueries(11):
+                result = sync_dues(student, post)
+            self.assertEqual(len(result['deleted']), 3)
+            self.assertEqual(len(result['updated']), months - 5)
+        for months in (6, 36):
+            student = make_student(months=months)
+            with self.assertNumQueries(6):
+                sync_dues(student, {'total_due_months': str(months * 2)})
+            self.assertEqual(student.dues.count(), months * 2)
+
+
+class LedgerDriftTests(TestCase):
+    """Every write path to StudentDue leaves the ledger matching the dues."""
+
+    def setUp(self):
+        self.student = make_student(months=4, paid=1)
+        self.other = make_student(months=2, name='Other')
+        self.due_admin = StudentDueAdmin(StudentDue, admin.site)
+
+    def assertNoDrift(self):
+        self.assertEqual(find_drift(list(Student.objects.values_list('id', flat=True))), [])
+
+    def test_student_add(self):
+        response = self.client.post(reverse('fees:student_add'), {
+            'name': 'New', 'mobile': '9876500001', 'course': 'Python',
+            'registration_date': '2025-03-01', 'joining_date': '2025-03-01',
+            'registration_fee': '500', 'total_due_months': '3', 'due_amount_0': '1000',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Student.objects.get(name='New').ledger.due_count, 3)
+        self.assertNoDrift()
+
+    def test_toggle_due(self):
+        due = self.student.dues.order_by('due_date').last()
+        url = reverse('fees:toggle_due', args=[due.id])
+        self.client.post(url, {'collected_by': 'Sridhar', 'payment_method': 'Cash'})
+        self.assertNoDrift()
+        self.client.post(url)
+        self.assertNoDrift()
+
+    def test_sync_dues(self):
+        self.client.post(reverse('fees:student_edit', args=[self.student.id]), {
+            'total_due_months': '2', 'due_amount_0': '1200',
+        })
+        self.assertEqual(self.student.dues.count(), 2)
+        self.assertNoDrift()
+
+    def test_update_student_dues(self):
+        post = {}
+        for i, due in enumerate(self.student.dues.all()):
+            post[f'due_date_{due.id}'] = due.due_date.isoformat()
+            post[f'amount_{due.id}'] = '1100'
+            post[f'paid_{due.id}'] = 'true' if i % 2 else 'false'
+        request = RequestFactory().post('/', post)
+        views.update_student_dues(request, self.student.id)
+        self.assertEqual(self.student.ledger.paid_count, 2)
+        self.assertNoDrift()
+
+    def test_mark_paid(self):
+        mark_paid(dues_for_rule([self.student.id, self.other.id], 'unpaid'), 'Binduja', 'GPay')
+        self.assertNoDrift()
+
+    def test_due_admin_save(self):
+        due = self.student.dues.order_by('due_date').last()
+        due.amount, due.paid = Decimal('99'), True
+        self.due_admin.save_model(None, due, None, True)
+        self.assertNoDrift()
+        due.student = self.other
+        self.due_admin.save_model(None, due, None, True)
+        self.assertNoDrift()
+
+    def test_due_admin_delete(self):
+        self.due_admin.delete_model(None, self.student.dues.order_by('due_date').last())
+        self.assertNoDrift()
+        self.due_admin.delete_queryset(None, StudentDue.objects.filter(student=self.other))
+        self.assertNoDrift()
+
+
+class StatusFilterTests(TestCase):
+    def setUp(self):
+        self.paid = make_student(months=2, paid=2, name='Paid')
+        self.overdue = make_student(months=2, paid=1, name='Overdue')
+        self.no_dues = make_student(months=0, name='No dues')
+        self.no_ledger = Student.objects.create(
+            name='No ledger', mobile='9876500002', course='Python',
+            registration_date=date(2025, 1, 10), joining_date=date(2025, 1, 10),
+        )
+
+    def filtered(self, status):
+        return set(filter_students(Student.objects.all(), {'status': status}, date(2026, 1, 1)))
+
+    def test_paid_needs_dues(self):
+        self.assertEqual(self.filtered('paid'), {self.paid})
+
+    def test_overdue(self):
+        self.assertEqual(self.filtered('overdue'), {self.overdue})
+
+    def test_unknown_status_is_ignored(self):
+        self.assertEqual(len(self.filtered('bogus')), 4)
+
+
+class StudentsApiTests(TestCase):
+    def setUp(self):
+        # equal sort keys throughout: pages must break ties on id
+        self.students = [make_student(months=3, paid=1, name=f'S{i}') for i in range(7)]
+        self.students.append(make_student(months=6, name='Long'))
+
+    def get(self, **params):
+        response = self.client.get(reverse('fees:api_students'), params)
+        return response.status_code, response.json()
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            status, body = self.get(**params, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(status, 200)
+            ids += [row['id'] for row in body['results']]
+            cursor = body['next']
+            if not cursor:
+                return ids
+
+    def test_months_order_pages_through_ties(self):
+        expected = [s.id for s in sorted(self.students, key=lambda s: (s.total_due_months, -s.id))]
+        self.assertEqual(self.walk(limit=3), expected)
+
+    def test_next_due_order_pages_through_ties(self):
+        expected = list(
+            StudentLedger.objects.order_by('next_due_date', 'student_id').values_list('student_id', flat=True)
+        )
+        self.assertEqual(self.walk(order='next_due', limit=2), expected)
+
+    def test_cursor_belongs_to_its_order(self):
+        _, body = self.get(limit=2)
+        status, body = self.get(order='next_due', cursor=body['next'])
+        self.assertEqual(status, 400)
+        self.assertEqual(self.get(cursor='not-a-cursor')[0], 400)
+
+    def test_fields(self):
+        _, body = self.get(fields='name,total_due', limit=1)
+        self.assertEqual(set(body['results'][0]), {'id', 'name', 'total_due'})
+        self.assertEqual(self.get(fields='name,password')[0], 400)
+
+    def test_include_dues(self):
+        _, body = self.get(include='dues', fields='name')
+        for row in body['results']:
+            student = Student.objects.get(pk=row['id'])
+            self.assertEqual([d['id'] for d in row['dues']], list(
+                student.dues.order_by('due_date').values_list('id', flat=True)
+            ))
+
+    def test_invalid_join_date_is_a_400(self):
+        status, body = self.get(join_from='bad')
+        self.assertEqual(status, 400)
+        self.assertIn('join_from', body['error'])
+        self.assertEqual(self.get(join_to='2025-01-10')[0], 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.student = make_student(months=2, paid=1)
+
+    def test_streams_the_ledger(self):
+        response = self.client.get(reverse('fees:export_ledger'))
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_invalid_join_date_is_a_400(self):
+        response = self.client.get(reverse('fees:export_ledger'), {'join_to': '2025-13-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+
+
+class StudentListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_student(months=2, name='Asha')
+
+    def test_cached_page_carries_only_list_params(self):
+        url = reverse('fees:student_list')
+        first = self.client.get(url, {'q': 'Asha', 'utm_source': 'first'}).content.decode()
+        second = self.client.get(url, {'q': 'Asha', 'utm_source': 'second'}).content.decode()
+        self.assertEqual(first, second)  # served from the page cache
+        self.assertNotIn('utm_source', first)
+        self.assertIn('name="next" value="q=Asha"', first)
+        self.assertIn('/export/?q=Asha&excel=1"', first)
+
+
+class AsyncToggleRegFeeTests(TestCase):
+    def setUp(self):
+        self.student = make_student(months=1)
+        self.toggle = async_to_sync(async_views.toggle_reg_fee)
+
+    def test_save_and_audit_commit_together(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.toggle(RequestFactory().get('/'), self.student.id)
+        self.assertEqual(len(callbacks), 1)  # the audit batch
+        self.student.refresh_from_db()
+        self.assertFalse(self.student.registration_fee_paid)
+        self.assertTrue(ActionLog.objects.filter(
+            action='toggle_reg_fee', entity_id=self.student.id, data={'paid': False},
+        ).exists())
+
+    def test_failed_audit_rolls_back_the_toggle(self):
+        with mock.patch('fees.async_views.audit', side_effect=DatabaseError('audit failed')):
+            with self.assertRaises(DatabaseError):
+                self.toggle(RequestFactory().get('/'), self.student.id)
+        self.student.refresh_from_db()
+        self.assertTrue(self.student.registration_fee_paid)
+
+
+# the manifest storage needs collectstatic, which tests don't run
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.student = make_student(months=30, paid=10, name='Asha Rao')
+        make_student(months=2, name='Other', mobile='9000000009')
+
+    def test_student_page_caps_the_dues_inline(self):
+        response = self.client.get(reverse('admin:fees_student_change', args=[self.student.id]))
+        formset = response.context['inline_admin_formsets'][0].formset
+        dues = [form.instance for form in formset.forms]
+        self.assertEqual(len(dues), StudentDueInline.MAX_DUES)
+        self.assertEqual(sum(not d.paid for d in dues), 20)
+        changelist = reverse('admin:fees_studentdue_changelist')
+        self.assertContains(response, f'{changelist}?student__id__exact={self.student.id}')
+
+    def test_student_page_saves_with_the_capped_inline(self):
+        url = reverse('admin:fees_student_change', args=[self.student.id])
+        response = self.client.get(url)
+        data = {
+            name: field.value() for name, field in
+            ((name, response.context['adminform'].form[name]) for name in (
+                'name', 'mobile', 'course', 'registration_date', 'joining_date',
+                'registration_fee', 'registration_fee_paid', 'total_due_months',
+            ))
+            if field.value() not in (None, False)
+        }
+        formset = response.context['inline_admin_formsets'][0].formset
+        data.update({f'{formset.prefix}-{k}': v for k, v in formset.management_form.initial.items()})
+        for form in formset.forms:
+            for name in form.fields:
+                value = form[name].value()
+                if value not in (None, False):
+                    data[form.add_prefix(name)] = value
+        first = formset.forms[0]
+        data[first.add_prefix('amount')] = '1234.00'
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(StudentDue.objects.get(pk=first.instance.pk).amount, Decimal('1234.00'))
+        self.assertEqual(self.student.dues.count(), 30)
+        self.assertEqual(find_drift([self.student.id]), [])
+
+    def test_dues_changelist_filters_by_student(self):
+        response = self.client.get(
+            reverse('admin:fees_studentdue_changelist'), {'student__id__exact': self.student.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {d.student_id for d in response.context['cl'].result_list}, {self.student.id}
+        )
+
+    def test_search_uses_the_student_index(self):
+        with mock.patch('fees.admin.search_students', wraps=search_students) as search:
+            response = self.client.get(reverse('admin:fees_student_changelist'), {'q': 'asha'})
+        search.assert_called_once()
+        self.assertEqual(list(response.context['cl'].result_list), [self.student])
+
+
+class TombstoneRetentionTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def days_ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def test_prune_keeps_recent_tombstones(self):
+        record_deletions(Tombstone.DUE, [(1, 1), (2, 1)], deleted_at=self.days_ago(100))
+        record_deletions(Tombstone.DUE, [(3, 1)], deleted_at=self.days_ago(10))
+        self.assertEqual(prune_tombstones(self.days_ago(90), chunk_size=1), 2)
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [3])
+
+    def test_prune_stops_at_the_rollup_watermark(self):
+        rollup.refresh_rollup(now=self.days_ago(120))
+        record_deletions(Tombstone.DUE, [(1, 1)], deleted_at=self.days_ago(100))
+        self.assertEqual(prune_tombstones(self.days_ago(90)), 0)
+        rollup.refresh_rollup()
+        self.assertEqual(prune_tombstones(self.days_ago(90)), 1)
+
+    def test_watermark_older_than_pruned_deletes_needs_a_resync(self):
+        stale = changes(now=self.days_ago(150))['watermark']
+        record_deletions(Tombstone.DUE, [(1, 1)], deleted_at=self.days_ago(100))
+        current = changes(now=self.days_ago(95))
+        self.assertEqual([t['object_id'] for t in current['deleted']], [1])
+        call_command('prune_tombstones', days=90, stdout=StringIO())
+
+        with self.assertRaises(StaleWatermark):
+            changes(stale)
+        response = self.client.get(reverse('fees:api_changes'), {'since': stale})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['resync'])
+        # seen before the prune, or starting afresh: nothing was missed
+        self.assertEqual(changes(current['watermark'])['deleted'], [])
+        self.assertEqual(self.client.get(reverse('fees:api_changes')).status_code, 200)
+
+    def test_quiet_delete_stream_keeps_up(self):
+        record_deletions(Tombstone.DUE, [(1, 1)], deleted_at=self.days_ago(100))
+        token = changes(now=self.days_ago(99))['watermark']
+        token = changes(token, now=self.days_ago(1))['watermark']
+        prune_tombstones(self.days_ago(90))
+        self.assertEqual(changes(token)['deleted'], [])
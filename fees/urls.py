@@ -1,12 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# under ASGI the list page and its partial-refresh endpoints run async
+list_views = views
+if settings.FEES_ASYNC_VIEWS:
+    from . import async_views as list_views
 
 app_name = "fees"   # 👈 IMPORTANT
 urlpatterns=[
-    path('', views.student_list, name='student_list'),
+    path('', list_views.student_list, name='student_list'),
     path('add/', views.student_add, name='student_add'),
+    path('import/', views.student_import, name='student_import'),
+    path('export/', views.export_ledger, name='export_ledger'),
+    path('reports/collections/', views.collections_report, name='collections_report'),
+    path('archive/', views.archive_list, name='archive_list'),
+    path('archive/<int:pk>/restore/', views.restore_archived_student, name='restore_archived_student'),
     path('edit/<int:pk>/', views.student_edit, name='student_edit'),
     path('delete/<int:pk>/', views.student_delete, name='student_delete'),
-    path('toggle_reg_fee/<int:pk>/', views.toggle_reg_fee, name='toggle_reg_fee'),
-    path('toggle_due/<int:due_id>/', views.toggle_due, name='toggle_due'),
+    path('toggle_reg_fee/<int:pk>/', list_views.toggle_reg_fee, name='toggle_reg_fee'),
+    path('toggle_due/<int:due_id>/', list_views.toggle_due, name='toggle_due'),
+    path('mark_paid/', list_views.mark_dues_paid, name='mark_dues_paid'),
+    path('reminder/<int:due_id>/', views.whatsapp_reminder, name='whatsapp_reminder'),
+    path('api/students/', api.students_api, name='api_students'),
+    path('api/changes/', api.changes_api, name='api_changes'),
 ]
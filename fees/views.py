@@ -1,14 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.http import HttpResponseBadRequest
 from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition, require_POST
 from django.db import transaction
-from django.db.models import Prefetch, Q
-from .models import Student, StudentDue, ActionLog
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from . import rollup
+from .archive import restore_student
+from .models import (
+    ArchivedDue, ArchivedStudent, ReminderOutbox, RollupWatermark, Student, StudentDue, StudentLedger,
+)
+from .audit import actor_for, audit
+from .caching import cache_list_page, list_etag, list_params
+from .db import is_lock_error, retry_on_db_lock
+from .export import csv_lines
 from .forms import StudentForm
+from .fragments import render_rows
+from .importer import import_students, read_rows
+from .ledger import refresh_ledgers
+from .payments import dues_for_rule, mark_paid, toggle_paid
+from .reminders import reminder_for
+from .schedule import build_dues, sync_dues
+from .queries import CountedPaginator, check_filter_dates, group_counts, student_queryset
 from datetime import date
-import calendar
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlencode
 
 
 def update_dues_safely(student, post_data):
@@ -17,167 +36,41 @@ def update_dues_safely(student, post_data):
     - Add new months when total increases
     - Remove only unpaid extra months when total decreases
     """
-    dues = list(student.dues.all().order_by('due_date'))
-    current_total = len(dues)
-    try:
-        requested_total = int(post_data.get('total_due_months', student.total_due_months) or student.total_due_months)
-    except:
-        requested_total = student.total_due_months
-
-    # Decrease: remove unpaid from end
-    if requested_total < current_total:
-        diff = current_total - requested_total
-        for d in reversed(dues):
-            if diff <= 0:
-                break
-            if not d.paid:
-                d.delete()
-                diff -= 1
-
-    # Refresh
-    dues = list(student.dues.all().order_by('due_date'))
-    current_total = len(dues)
-
-    # Increase: add blank months or use posted fields
-    from datetime import date
-    import calendar
-    def add_months(base_date, months):
-        y = base_date.year + (base_date.month - 1 + months) // 12
-        m = (base_date.month - 1 + months) % 12 + 1
-        d = min(base_date.day, calendar.monthrange(y, m)[1])
-        return date(y, m, d)
-
-    if requested_total > current_total:
-        start = current_total
-        for i in range(start, requested_total):
-            ds = (post_data.get(f'due_date_{i}') or '').strip()
-            amts = (post_data.get(f'due_amount_{i}') or '').strip()
-            if ds:
-                y, m, d = map(int, ds.split('-'))
-                due_dt = date(y, m, d)
-            else:
-                due_dt = add_months(student.joining_date, i)
-            try:
-                amt = float(amts) if amts else 0.0
-            except:
-                amt = 0.0
-            student.dues.create(due_date=due_dt, amount=amt, paid=False)
-
-    # Update existing unpaid dues from posted edits
-    dues = list(student.dues.all().order_by('due_date'))
-    for i, d in enumerate(dues):
-        if i >= requested_total:
-            continue
-        if d.paid:
-            continue
-        ds = (post_data.get(f'due_date_{i}') or '').strip()
-        amts = (post_data.get(f'due_amount_{i}') or '').strip()
-        if ds:
-            y, m, day = map(int, ds.split('-'))
-            d.due_date = date(y, m, day)
-        if amts:
-            try:
-                d.amount = float(amts)
-            except:
-                pass
-        d.save()
+    return sync_dues(student, post_data)
 
 
-def add_months(base_date, months):
-    y = base_date.year + (base_date.month - 1 + months) // 12
-    m = (base_date.month - 1 + months) % 12 + 1
-    d = min(base_date.day, calendar.monthrange(y, m)[1])
-    return date(y, m, d)
+def reminder_link(due_id):
+    """List link to the WhatsApp reminder of the unpaid due ``due_id``."""
+    return reverse('fees:whatsapp_reminder', args=[due_id]) if due_id else None
 
 
-
-from urllib.parse import quote_from_bytes
-def ordinal(n):
-    """Convert 1 -> 1st, 2 -> 2nd, 3 -> 3rd, etc."""
-    if 10 <= n % 100 <= 20:
-        suffix = "th"
-    else:
-        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
-    return f"{n}{suffix}"
-
+@ensure_csrf_cookie
+@condition(etag_func=list_etag)
+@cache_list_page
 def student_list(request):
-    # Base queryset with dues prefetched and ordered once
-    dues_qs = StudentDue.objects.order_by('due_date')
-    qs = (
-        Student.objects
-        .all()
-        .order_by('-id')
-        .prefetch_related(Prefetch('dues', queryset=dues_qs))
-    )
-
-    # filters
+    # Totals are read from the ledger; dues are only loaded for the visible
+    # rows that are not already in the fragment cache.
+    qs = student_queryset(request.GET)
     join_from = (request.GET.get('join_from') or '').strip()
     join_to = (request.GET.get('join_to') or '').strip()
     search = (request.GET.get('q') or '').strip()
-
-    if join_from:
-        qs = qs.filter(joining_date__gte=join_from)
-    if join_to:
-        qs = qs.filter(joining_date__lte=join_to)
-    if search:
-        qs = qs.filter(Q(name__icontains=search) | Q(mobile__icontains=search))
-
-    # Build data for all filtered students (no global pagination)
-    data = []
     today = date.today()
-    for s in qs:
-        dues = list(s.dues.all())  # already ordered by due_date
-
-        completed = sum(1 for d in dues if d.paid)
-        total_paid = sum(float(d.amount) for d in dues if d.paid)
-        total_due = sum(float(d.amount) for d in dues if not d.paid)
-        oldest_unpaid = next((d for d in dues if not d.paid), None)
-        whatsapp_link = None
-        if oldest_unpaid:
-            installment_number = dues.index(oldest_unpaid) + 1
-            msg = (
-                "\U00002728 Greetings from AITech Academy \U00002728\n\n"
-                f"\U0001F44B Hello *{s.name}*,\n\n"
-                "This is a gentle reminder from AITech Academy regarding your academy fees. "
-                f"Your payment for *{ordinal(installment_number)} Month Due* is pending, "
-                f"with a due amount of *₹{oldest_unpaid.amount}* \U0001F4B0.\n\n"
-                f"The due date for this payment is *{oldest_unpaid.due_date.strftime('%d %b %Y')}*. "
-                "We kindly request you to clear the dues within this week \U000023F3\n\n"
-                "\U0001F64F Thank you for your cooperation.\n\n"
-                "Warm regards,\n"
-                "AITech Academy Team"
-            )
-
-            encoded = quote_from_bytes(msg.encode("utf-8"))
-            # put your country code (e.g., 91 for India) in front of the number
-            whatsapp_link = f"https://api.whatsapp.com/send?phone=91{s.mobile}&text={encoded}"
-
-        data.append({
-            'student': s,
-            'dues': dues,
-            'completed': completed,
-            'total': s.total_due_months,
-            'total_paid': total_paid,
-            'total_due': total_due,
-            'whatsapp_link': whatsapp_link
-        })
-
-    # group by duration (on current page) and paginate within each group
-    groups_by_months = {}
-    for item in data:
-        months = item['student'].total_due_months
-        groups_by_months.setdefault(months, []).append(item)
 
     try:
         group_page_size = int(request.GET.get('group_page_size') or 10)
     except Exception:
         group_page_size = 10
 
+    # one grouped COUNT for the headers, then one page query per group
+    counts = group_counts(request.GET)
     grouped_pages = []
-    for months, items in sorted(groups_by_months.items()):
-        group_paginator = Paginator(items, group_page_size)
+    for months, n in sorted(counts.items()):
+        group_paginator = CountedPaginator(
+            qs.filter(total_due_months=months), group_page_size, n
+        )
         page_param = request.GET.get(f'gp_{months}')
         group_page_obj = group_paginator.get_page(page_param)
+        group_page_obj.object_list = list(group_page_obj.object_list)
         grouped_pages.append({
             'months': months,
             'label': f"{months} Month(s)",
@@ -185,18 +78,45 @@ def student_list(request):
             'paginator': group_paginator,
         })
 
+    # rows are served from the fragment cache; only misses load their dues
+    page_students = [s for gp in grouped_pages for s in gp['page_obj'].object_list]
+    rows = render_rows(page_students, _student_row, today)
+    for gp in grouped_pages:
+        gp['page_obj'].object_list = [
+            {'student': s, 'row_html': rows[s.id]} for s in gp['page_obj'].object_list
+        ]
+
     ctx = {
         'grouped_pages': grouped_pages,
         'join_from': join_from,
         'join_to': join_to,
         'q': search,
+        'status': (request.GET.get('status') or '').strip(),
+        'sort': (request.GET.get('sort') or '').strip(),
         'today': today,
-        'total_students': qs.count(),
+        'total_students': sum(counts.values()),
         'group_page_size': group_page_size,
+        # only the params that are part of the page's cache key
+        'list_query': urlencode(list_params(request.GET)),
+        'csrf_cookie_name': settings.CSRF_COOKIE_NAME,
     }
     return render(request, 'fees/student_list.html', ctx)
 
 
+def _student_row(s):
+    dues = list(s.dues.all())  # already ordered by due_date
+    return {
+        'student': s,
+        'dues': dues,
+        'completed': s.completed,
+        'total': s.total_due_months,
+        'total_paid': s.total_paid,
+        'total_due': s.total_due,
+        'whatsapp_link': reminder_link(s.oldest_unpaid_id),
+    }
+
+
+@retry_on_db_lock
 def student_add(request):
     if request.method == 'POST':
         form = StudentForm(request.POST)
@@ -207,31 +127,15 @@ def student_add(request):
             with transaction.atomic():
                 s = form.save()
                 total = max(0, int(s.total_due_months or 0))
-                for i in range(total):
-                    raw_amt = (request.POST.get(f'due_amount_{i}') or '').strip()
-                    from decimal import Decimal, InvalidOperation
-                    try:
-                        amt = Decimal(raw_amt) if raw_amt else Decimal('0')
-                    except (InvalidOperation, Exception):
-                        amt = Decimal('0')
-
-                    date_str = (request.POST.get(f'due_date_{i}') or '').strip()
-                    if date_str:
-                        try:
-                            y, m, d = map(int, date_str.split('-'))
-                            due_dt = date(y, m, d)
-                        except Exception:
-                            due_dt = add_months(s.joining_date, i)
-                    else:
-                        due_dt = add_months(s.joining_date, i)
-
-                    StudentDue.objects.create(student=s, due_date=due_dt, amount=amt)
-
-                ActionLog.objects.create(action='add_student', payload=str(s.id))
+                StudentDue.objects.bulk_create(build_dues(s, request.POST, 0, total))
+                refresh_ledgers([s.id])
+                audit('add_student', s, actor=actor_for(request), months=total)
         except Exception as e:
+            if is_lock_error(e):
+                raise  # let retry_on_db_lock run the request again
             # Persist error for debugging and surface message
             try:
-                ActionLog.objects.create(action='error_add_student', payload=str(e))
+                audit('error_add_student', actor=actor_for(request), error=str(e))
             except Exception:
                 pass
             return HttpResponseBadRequest(f'Could not save student: {e}')
@@ -241,10 +145,128 @@ def student_add(request):
         form = StudentForm(initial={'registration_date': date.today(), 'joining_date': date.today()})
     return render(request, 'fees/student_add.html', {'form': form})
 
+def student_import(request):
+    ctx = {}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        try:
+            start_row = max(0, int(request.POST.get('start_row') or 0))
+        except ValueError:
+            start_row = 0
+        ctx['start_row'] = start_row
+        if not upload:
+            ctx['error'] = 'Choose a CSV or XLSX file to import.'
+        else:
+            try:
+                ctx['report'] = import_students(
+                    read_rows(upload.file, upload.name), start_row=start_row,
+                    actor=actor_for(request),
+                )
+            except ValueError as e:
+                ctx['error'] = str(e)
+    return render(request, 'fees/student_import.html', ctx)
+
+def export_ledger(request):
+    """Stream the filtered ledger as CSV (``?excel=1`` adds a BOM for Excel,
+    ``?archived=0`` leaves out archived students)."""
+    # checked up front: once the response streams, an error can only cut it short
+    try:
+        check_filter_dates(request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    excel = request.GET.get('excel') == '1'
+    include_archived = request.GET.get('archived') != '0'
+    response = StreamingHttpResponse(
+        csv_lines(request.GET, excel=excel, include_archived=include_archived),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="fee-ledger-{date.today():%Y%m%d}.csv"'
+    return response
+
+def collections_report(request):
+    """Monthly expected / collected / outstanding totals from the
+    collections rollup (``manage.py refresh_collections`` keeps it current)."""
+    today = date.today()
+    try:
+        year = int(request.GET.get('year') or today.year)
+    except ValueError:
+        year = today.year
+    watermark = RollupWatermark.objects.filter(name=rollup.WATERMARK).first()
+    ctx = rollup.collections_report(year, today)
+    ctx.update({
+        'year': year,
+        'years': range(today.year, today.year - 5, -1),
+        'refreshed_at': watermark.refreshed_at if watermark else None,
+    })
+    return render(request, 'fees/collections_report.html', ctx)
+
+ARCHIVE_PAGE_SIZE = 50
+
+def archive_list(request):
+    """Browse the archived students (fees.archive), newest archived first."""
+    qs = ArchivedStudent.objects.order_by('-archived_at', '-id')
+    search = (request.GET.get('q') or '').strip()
+    if search:
+        qs = qs.filter(Q(name__icontains=search) | Q(mobile__contains=search))
+    page_obj = Paginator(qs, ARCHIVE_PAGE_SIZE).get_page(request.GET.get('page'))
+    totals = {
+        r['student_id']: r
+        for r in ArchivedDue.objects.filter(student_id__in=[s.id for s in page_obj])
+        .values('student_id').annotate(months=Count('id'), paid=Sum('amount'))
+    }
+    for s in page_obj:
+        s.totals = totals.get(s.id)
+    return render(request, 'fees/archive_list.html', {'page_obj': page_obj, 'q': search})
+
+@require_POST
+@retry_on_db_lock
+def restore_archived_student(request, pk):
+    try:
+        student = restore_student(pk, actor=actor_for(request))
+    except ArchivedStudent.DoesNotExist:
+        raise Http404("No archived student with this id")
+    return redirect('fees:student_edit', pk=student.pk)
+
+def wants_partial(request):
+    """True for the list page's fetch() calls, which patch the row in place."""
+    return (
+        request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        or request.GET.get('format') == 'json'
+    )
+
+
+def _student_totals(request, student, ledger=None):
+    """Refreshed totals cells for one student, as a JSON-ready dict."""
+    ledger = ledger or StudentLedger.objects.filter(student=student).first()
+    dues = list(student.dues.order_by('due_date'))
+    ctx = {
+        'student': student,
+        'total_paid': ledger.paid_amount if ledger else 0,
+        'total_due': ledger.outstanding_amount if ledger else 0,
+        'whatsapp_link': reminder_link(ledger.next_due_id if ledger else None),
+    }
+    return {
+        'student_id': student.id,
+        'completed': ledger.paid_count if ledger else 0,
+        'total_paid': f"{ctx['total_paid']:.2f}",
+        'total_due': f"{ctx['total_due']:.2f}",
+        'html': render_to_string('fees/_student_totals.html', ctx, request),
+    }, dues
+
+
+@retry_on_db_lock
 def toggle_reg_fee(request,pk):
     s = get_object_or_404(Student,pk=pk)
     s.registration_fee_paid = not s.registration_fee_paid
-    s.save()
+    with transaction.atomic():
+        s.save()
+        audit('toggle_reg_fee', s, actor=actor_for(request), paid=s.registration_fee_paid)
+    if wants_partial(request):
+        return JsonResponse({
+            'student_id': s.id,
+            'registration_fee_paid': s.registration_fee_paid,
+            'html': render_to_string('fees/_reg_fee_button.html', {'student': s}, request),
+        })
     next_qs = (request.GET.get('next') or '').strip()
     if next_qs:
         return redirect(f"{reverse('fees:student_list')}?{next_qs}")
@@ -259,30 +281,89 @@ def toggle_reg_fee(request,pk):
 
 
 
+@retry_on_db_lock
 def toggle_due(request, due_id):
     d = get_object_or_404(StudentDue, pk=due_id)
+    ledger = None
 
     if request.method == "POST":
-        if d.paid:
-            # 👇 Reset back to unpaid
-            d.paid = False
-            d.collected_by = None
-            d.payment_method = None
-        else:
-            # 👇 Mark as paid
-            d.paid = True
-            d.collected_by = request.POST.get("collected_by")
-            d.payment_method = request.POST.get("payment_method")
-
-        d.save()
+        ledger = toggle_paid(
+            d, request.POST.get("collected_by"), request.POST.get("payment_method"),
+            actor=actor_for(request),
+        )
+    if wants_partial(request):
+        totals, dues = _student_totals(request, d.student, ledger)
+        card = render_to_string('fees/_due_card.html', {
+            'd': d,
+            'student': d.student,
+            'month_number': [x.id for x in dues].index(d.id) + 1,
+            'today': date.today(),
+        }, request)
+        return JsonResponse({'due_id': d.id, 'paid': d.paid, 'html': card, 'totals': totals})
     next_qs = (request.POST.get('next') or '').strip()
     if next_qs:
         return redirect(f"{reverse('fees:student_list')}?{next_qs}")
     return redirect("fees:student_list")
 
 
+@require_POST
+@retry_on_db_lock
+def mark_dues_paid(request):
+    """Mark many dues paid at once: explicit ``due_ids``, or ``student_ids``
+    with a ``rule`` ('overdue' or 'unpaid')."""
+    collected_by = (request.POST.get('collected_by') or '').strip()
+    payment_method = (request.POST.get('payment_method') or '').strip()
+    if not collected_by or not payment_method:
+        return HttpResponseBadRequest('collected_by and payment_method are required')
+    try:
+        due_ids = [int(x) for x in request.POST.getlist('due_ids')]
+        student_ids = [int(x) for x in request.POST.getlist('student_ids')]
+        if due_ids:
+            dues = StudentDue.objects.filter(id__in=due_ids)
+        else:
+            dues = dues_for_rule(student_ids, request.POST.get('rule') or 'overdue')
+    except ValueError as e:
+        return HttpResponseBadRequest(f'Invalid selection: {e}')
+
+    due_ids, ledgers = mark_paid(dues, collected_by, payment_method, actor_for(request))
+    if wants_partial(request):
+        return JsonResponse({
+            'due_ids': due_ids,
+            'students': [
+                {
+                    'student_id': l.student_id,
+                    'completed': l.paid_count,
+                    'total_paid': f"{l.paid_amount:.2f}",
+                    'total_due': f"{l.outstanding_amount:.2f}",
+                }
+                for l in ledgers
+            ],
+        })
+    next_qs = (request.POST.get('next') or '').strip()
+    if next_qs:
+        return redirect(f"{reverse('fees:student_list')}?{next_qs}")
+    return redirect('fees:student_list')
+
+
+
+@retry_on_db_lock
+def whatsapp_reminder(request, due_id):
+    """Follow a list reminder link: open the due's outbox entry (rendered
+    now if the job has not built it yet) in WhatsApp and mark it opened."""
+    due = get_object_or_404(StudentDue.objects.select_related('student'), pk=due_id, paid=False)
+    reminder = reminder_for(due)
+    if reminder.status == ReminderOutbox.PENDING:
+        with transaction.atomic():
+            ReminderOutbox.objects.filter(pk=reminder.pk).update(
+                status=ReminderOutbox.OPENED, opened_at=timezone.now()
+            )
+            audit('open_reminder', due, actor=actor_for(request), student_id=due.student_id)
+    return redirect(reminder.link)
+
+
 from datetime import datetime
 
+@retry_on_db_lock
 def student_edit(request, pk):
     s = get_object_or_404(Student, pk=pk)
     if request.method == 'POST':
@@ -305,8 +386,16 @@ def student_edit(request, pk):
         except:
             pass
 
-        s.save()
-        update_dues_safely(s, request.POST)
+        with transaction.atomic():
+            s.save()
+            changes = update_dues_safely(s, request.POST)
+            audit(
+                'edit_student', s, actor=actor_for(request),
+                months=s.total_due_months,
+                deleted_due_ids=changes['deleted'],
+                updated_due_ids=[d.id for d in changes['updated']],
+                created_dues=len(changes['created']),
+            )
         next_qs = (request.POST.get('next') or '').strip()
         if next_qs:
             return redirect(f"{reverse('fees:student_list')}?{next_qs}")
@@ -320,14 +409,18 @@ def student_edit(request, pk):
             'total_due_months': s.total_due_months
         })
 
+@retry_on_db_lock
 def student_delete(request, pk):
     s = get_object_or_404(Student, pk=pk)
-    s.delete()
+    with transaction.atomic():
+        audit('delete_student', s, actor=actor_for(request), name=s.name, mobile=s.mobile)
+        s.delete()
     next_qs = (request.GET.get('next') or '').strip()
     if next_qs:
         return redirect(f"{reverse('fees:student_list')}?{next_qs}")
     return redirect('fees:student_list')
     
+@retry_on_db_lock
 def update_student_info(request, pk):
     student = get_object_or_404(Student, pk=pk)
     if request.method == 'POST':
@@ -335,19 +428,25 @@ def update_student_info(request, pk):
         student.course = request.POST.get('course', student.course) or student.course
         student.joining_date = request.POST.get('joining_date', student.joining_date) or student.joining_date
         student.registration_fee = request.POST.get('registration_fee', student.registration_fee) or student.registration_fee
-        student.save()
+        with transaction.atomic():
+            student.save()
+            audit('edit_student_info', student, actor=actor_for(request))
     return redirect('fees:student_edit', pk=pk)
 
+@retry_on_db_lock
 def update_student_dues(request, pk):
     student = get_object_or_404(Student, pk=pk)
     dues = student.dues.all()
     if request.method == 'POST':
-        for due in dues:
-            due.due_date = request.POST.get(f'due_date_{due.id}')
-            due.amount = request.POST.get(f'amount_{due.id}')
-            paid_value = request.POST.get(f'paid_{due.id}')
-            due.paid = True if paid_value == 'true' else False
-            due.save()
+        with transaction.atomic():
+            for due in dues:
+                due.due_date = request.POST.get(f'due_date_{due.id}')
+                due.amount = request.POST.get(f'amount_{due.id}')
+                paid_value = request.POST.get(f'paid_{due.id}')
+                due.paid = True if paid_value == 'true' else False
+                due.save()
+            refresh_ledgers([student.id])
+            audit('edit_student_dues', student, actor=actor_for(request), due_ids=[d.id for d in dues])
     return redirect('fees:student_edit', pk=pk)  # fixed
 
 
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
  
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fees.middleware.ServerTimingMiddleware',  # 👈 Server-Timing + slow request log
     'whitenoise.middleware.WhiteNoiseMiddleware',  # 👈 added for static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,15 +53,77 @@ TEMPLATES = [{
 }]
  
 WSGI_APPLICATION = 'student_fees.wsgi.application'
+ASGI_APPLICATION = 'student_fees.asgi.application'
+# serve the list page and its partial updates from fees.async_views; turn on
+# when running under ASGI, e.g.
+#   FEES_ASYNC_VIEWS=1 uvicorn student_fees.asgi:application --workers 2
+FEES_ASYNC_VIEWS = os.getenv("FEES_ASYNC_VIEWS", "0") == "1"
  
 
 # DATABASES config
 DATABASES = {
     "default": dj_database_url.config(
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        # keep connections per worker; under ASGI every request runs its ORM
+        # calls in a fresh thread, so persistent connections would only leak
+        conn_max_age=int(os.getenv("CONN_MAX_AGE", "0" if FEES_ASYNC_VIEWS else "600")),
+        conn_health_checks=True,
     )
 }
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # seconds a writer waits for the lock; WAL and the other PRAGMAs are set
+    # per connection in fees/db.py (FEES_SQLITE_PRAGMAS overrides them)
+    DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = int(os.getenv("SQLITE_TIMEOUT", "20"))
 # ------------------------------------------------- #
+
+# CACHE config
+# Local memory by default; set CACHE_DIR to share one file-based cache
+# between gunicorn workers. No external cache service is needed.
+CACHE_DIR = os.getenv("CACHE_DIR")
+CACHES = {
+    "default": {
+        "BACKEND": (
+            "django.core.cache.backends.filebased.FileBasedCache" if CACHE_DIR
+            else "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": CACHE_DIR or "student-fees",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+# rendered student_list rows (fees.fragments)
+FEES_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+# ------------------------------------------------- #
+
+# /api/changes/ holds back rows younger than this, so a client's watermark
+# never passes a write that has not committed yet (fees.sync)
+FEES_SYNC_SETTLE_SECONDS = 2
+
+# manage.py prune_tombstones keeps this many days of deletes for the changes
+# feed; clients that have not synced for longer get a full resync (fees.sync)
+FEES_TOMBSTONE_RETENTION_DAYS = int(os.getenv("FEES_TOMBSTONE_RETENTION_DAYS", "90"))
+
+# manage.py prune_action_log keeps this many days of audit entries
+FEES_AUDIT_RETENTION_DAYS = int(os.getenv("FEES_AUDIT_RETENTION_DAYS", "365"))
+
+# manage.py archive_students moves fully paid students once their last due
+# is this many days old (fees.archive)
+FEES_ARCHIVE_AFTER_DAYS = int(os.getenv("FEES_ARCHIVE_AFTER_DAYS", "180"))
+
+# ---------------- REQUEST TIMING ---------------- #
+# fees.middleware.ServerTimingMiddleware logs requests over either limit
+FEES_SLOW_REQUEST_MS = int(os.getenv("FEES_SLOW_REQUEST_MS", "500"))
+FEES_QUERY_BUDGET = int(os.getenv("FEES_QUERY_BUDGET", "50"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "fees.slow_requests": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
+# ------------------------------------------------ #
  
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Asia/Kolkata'